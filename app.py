@@ -3,17 +3,38 @@
 # ----------------------------------------------------------------------------#
 
 import json
+import time
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, g, has_request_context, jsonify, Blueprint
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from flask_migrate import Migrate
+from flask.cli import AppGroup
+import click
+from werkzeug.exceptions import HTTPException
 from forms import *
-from datetime import datetime
+from search import TrigramIndex, escape_like
+from pagination import Page, decode_offset, encode_offset, keyset_page
+from cache import PageCache
+from conditional import conditional
+from serializers import Schema, dumps
+from compression import CompressionMiddleware
+from importer import ImportReport, chunked, copy_rows, parse_datetime, read_records, validate
+from exporter import STREAM_FORMATS, write_parquet
+from pool import MeteredQueuePool, pool_stats
+from profiler import SQLProfiler
+from metrics import Metrics
+from async_reads import AsyncReader
+from routing import ReplicaRouter, RoutingSQLAlchemy, replica_reads
+import assets
+from datetime import datetime, timezone
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from functools import lru_cache
+from itertools import chain, groupby
 import sys
 import os
 # ----------------------------------------------------------------------------#
@@ -23,17 +44,85 @@ import os
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('poolclass', MeteredQueuePool)
+db = RoutingSQLAlchemy(app)
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+
+
+@app.teardown_appcontext
+def end_session(exception):
+    # every request gives its connection back, rolled back if it failed
+    if exception is not None:
+        db.session.rollback()
+    db.session.remove()
+
 
 # TODO: connect to a local postgresql database
 migrate = Migrate(app, db)
+page_cache = PageCache(app)
+sql_profiler = SQLProfiler(app)
+async_reads = AsyncReader(app)
+replica_router = ReplicaRouter(app, db)
+static_assets = assets.Assets(app)
+app_metrics = Metrics(app)
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
 
 
+# genre association tables; the (genre_id, owner_id) index serves
+# "venues/artists by genre" lookups
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id')
+)
+
+
+class utc_now(FunctionElement):
+    # server-side default of the updated_at columns, in naive UTC like the
+    # datetime.utcnow the ORM writes (CURRENT_TIMESTAMP is local time on
+    # PostgreSQL, UTC on SQLite)
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def compile_utc_now(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utc_now, 'postgresql')
+def compile_utc_now_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Genre {self.id} {self.name}>'
+
+
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        # the keyset order of the venue listing, see VENUE_LISTING_KEY
+        db.Index('ix_venue_state_city_id', 'state', 'city', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String())
@@ -41,12 +130,17 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String())
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     website_link = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(), default='Null')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now())
+    # denormalized show counters, see the "Show counters" section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # parent class relationship
     venue = db.relationship('Shows', backref='venue',
@@ -59,19 +153,28 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     website_link = db.Column(db.String(500))
     seeking_venues = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(
         db.String(), default='Null')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now())
+    # denormalized show counters, see the "Show counters" section
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # parent class relation ship
     artist = db.relationship('Shows', backref='artist', lazy=True)
@@ -82,161 +185,595 @@ class Artist(db.Model):
 
 class Shows(db.Model):
     __tablename__ = 'shows'
+    # every show query filters on venue or artist together with start_time;
+    # (start_time, id) is also the /shows keyset order
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time', 'start_time', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=utc_now())
+
+
+class ShowCounterState(db.Model):
+    # single row recording the time up to which shows have been rolled over
+    # from the upcoming to the past counters
+    __tablename__ = 'show_counter_state'
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+
+# the trigram name indexes need pg_trgm when tables are created with create_all()
+db.event.listen(db.metadata, 'before_create', db.DDL(
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+    # the parsed Babel pattern and locale, once per (format, locale)
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def formatted_datetime(value, format, locale):
+    pattern, locale = datetime_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    # views pass datetimes; strings are still accepted and parsed
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    return formatted_datetime(value, format, locale)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
-current_date_time = str(datetime.now())
+# ----------------------------------------------------------------------------#
+# Time.
+# ----------------------------------------------------------------------------#
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+# CLOCK returns the current timezone-aware time; tests and caching layers can
+# swap it for a frozen clock
+app.config.setdefault('CLOCK', utc_now)
+
+
+def request_now():
+    # "now" for every past/upcoming decision made while handling a request,
+    # read from the clock once per request
+    if not has_request_context():
+        return app.config['CLOCK']()
+    if 'now' not in g:
+        g.now = app.config['CLOCK']()
+    return g.now
+
+
+def show_time_now():
+    # Shows.start_time holds naive local wall-clock times, so it is compared
+    # against the request's now converted to the same terms
+    return request_now().astimezone().replace(tzinfo=None)
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count/past_shows_count so listings
+# and search never aggregate over shows. A show counts as upcoming while its
+# start_time is after the rollover watermark; `flask counters rollover`, run
+# periodically, advances the watermark and moves the shows it passes from
+# the upcoming to the past counters. `flask counters rebuild` recomputes
+# every counter from scratch.
+
+
+def counters_watermark():
+    # read under a share lock: a rollover holds the row FOR UPDATE, so a show
+    # counted while one runs is compared against the watermark it commits
+    # rather than the one it is replacing
+    state = db.session.query(ShowCounterState).with_for_update(read=True).get(1)
+    if state is None:
+        return show_time_now()
+    return state.rolled_over_at
+
+
+def count_new_shows(shows):
+    # add (artist_id, venue_id, start_time) triples to the counters with one
+    # executemany UPDATE per table
+    watermark = counters_watermark()
+    counts = {Venue: {}, Artist: {}}
+    for artist_id, venue_id, start_time in shows:
+        upcoming = start_time > watermark
+        for model, id in ((Venue, int(venue_id)), (Artist, int(artist_id))):
+            up, past = counts[model].get(id, (0, 0))
+            counts[model][id] = (up + 1, past) if upcoming else (up, past + 1)
+    for model, by_id in counts.items():
+        if not by_id:
+            continue
+        table = model.__table__
+        db.session.execute(table.update().where(table.c.id == db.bindparam('owner_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('up'),
+            past_shows_count=table.c.past_shows_count + db.bindparam('past')
+        ), [{'owner_id': id, 'up': up, 'past': past} for id, (up, past) in by_id.items()])
+
+
+def count_new_show(artist_id, venue_id, start_time):
+    count_new_shows([(artist_id, venue_id, start_time)])
+
+
+def uncount_venue_shows(venue_id):
+    # take a venue's shows off its artists' counters before it is deleted
+    watermark = counters_watermark()
+    rows = db.session.query(
+        Shows.artist_id,
+        db.func.sum(db.case((Shows.start_time > watermark, 1), else_=0)).label('upcoming'),
+        db.func.sum(db.case((Shows.start_time <= watermark, 1), else_=0)).label('past')
+    ).filter(Shows.venue_id == venue_id).group_by(Shows.artist_id).all()
+    for row in rows:
+        db.session.query(Artist).filter(Artist.id == row.artist_id).update({
+            Artist.upcoming_shows_count: Artist.upcoming_shows_count - row.upcoming,
+            Artist.past_shows_count: Artist.past_shows_count - row.past
+        }, synchronize_session=False)
+
+
+def set_counters_watermark(now):
+    state = ShowCounterState.query.get(1)
+    if state is None:
+        db.session.add(ShowCounterState(id=1, rolled_over_at=now))
+    else:
+        state.rolled_over_at = now
+
+
+def roll_over_show_counters(now):
+    # move shows that started since the last rollover from upcoming to past;
+    # returns the number of shows moved
+    watermark = db.session.query(ShowCounterState).with_for_update().get(1)
+    if watermark is None:
+        rebuild_show_counters(now)
+        return 0
+    moved = 0
+    for model, show_fk in ((Venue, Shows.venue_id), (Artist, Shows.artist_id)):
+        rows = db.session.query(show_fk.label('id'), db.func.count(Shows.id).label('n')).filter(
+            Shows.start_time > watermark.rolled_over_at,
+            Shows.start_time <= now
+        ).group_by(show_fk).all()
+        for row in rows:
+            db.session.query(model).filter(model.id == row.id).update({
+                model.upcoming_shows_count: model.upcoming_shows_count - row.n,
+                model.past_shows_count: model.past_shows_count + row.n
+            }, synchronize_session=False)
+        if model is Venue:
+            moved = sum(row.n for row in rows)
+    watermark.rolled_over_at = now
+    db.session.commit()
+    return moved
+
+
+def rebuild_show_counters(now):
+    # recompute every counter with one correlated UPDATE per table
+    for model, show_fk in ((Venue, Shows.venue_id), (Artist, Shows.artist_id)):
+        def show_count(*criteria):
+            return db.select(db.func.count(Shows.id)).where(
+                show_fk == model.id, *criteria).scalar_subquery()
+        db.session.query(model).update({
+            model.upcoming_shows_count: show_count(Shows.start_time > now),
+            model.past_shows_count: show_count(Shows.start_time <= now)
+        }, synchronize_session=False)
+    set_counters_watermark(now)
+    db.session.commit()
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
 
+def stream_template(template_name, **context):
+    # like render_template, but yields the page in chunks as it renders
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    # coalesce Jinja's many tiny fragments into fewer, larger chunks
+    stream.enable_buffering(app.config['STREAM_BUFFER_SIZE'])
+    return app_metrics.timed_stream(template_name, stream)
+
+
+def stream_page(template_name, **context):
+    # a streamed response of the page; generators in `context` are consumed
+    # as the template renders, so rows never pile up in memory
+    return Response(stream_with_context(stream_template(template_name, **context)))
+
+
+def page_limit():
+    limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+    return min(max(limit, 1), app.config['MAX_PAGE_SIZE'])
+
+
+def listing_page(query, columns):
+    # one keyset page of `query` for the ?after= / ?before= / ?limit= args
+    limit = page_limit()
+    try:
+        return keyset_page(query, columns, after=request.args.get('after'),
+                           before=request.args.get('before'), limit=limit)
+    except ValueError:
+        abort(400)
+
+
 @app.route('/')
 def index():
     return render_template('pages/home.html')
 
 
+# Version stamps for conditional GET: one aggregate query each, returning the
+# latest updated_at first, followed by whatever else changes the page
+# (row counts catch deletions, past-show counts catch the passage of time).
+
+
+def latest(*times):
+    times = [t for t in times if t is not None]
+    return max(times) if times else None
+
+
+def venues_stamp():
+    row = db.session.query(db.func.max(Venue.updated_at), db.func.count(Venue.id)).one()
+    return tuple(row)
+
+
+def artists_stamp():
+    row = db.session.query(db.func.max(Artist.updated_at), db.func.count(Artist.id)).one()
+    return tuple(row)
+
+
+def shows_stamp():
+    row = db.session.query(
+        db.func.max(Shows.updated_at),
+        db.select(db.func.max(Venue.updated_at)).scalar_subquery(),
+        db.select(db.func.max(Artist.updated_at)).scalar_subquery(),
+        db.func.count(Shows.id)
+    ).one()
+    return (latest(*row[:3]),) + tuple(row[3:])
+
+
+def detail_stamp(model, id, partner, show_fk, partner_fk):
+    now = show_time_now()
+    row = db.session.query(
+        db.select(model.updated_at).where(model.id == id).scalar_subquery(),
+        db.func.max(Shows.updated_at),
+        db.func.max(partner.updated_at),
+        db.func.count(Shows.id),
+        db.func.sum(db.case((Shows.start_time <= now, 1), else_=0))
+    ).select_from(Shows).join(partner, partner.id == partner_fk).filter(show_fk == id).one()
+    return (latest(*row[:3]),) + tuple(row[3:]) + (model.__tablename__, id)
+
+
+# the detail stamps run the same join as the page itself, so they are cached
+# with the page and dropped by the same invalidate_pages() calls
+
+
+def venue_stamp(venue_id):
+    return page_cache.stamp('venue:%s' % venue_id, lambda: detail_stamp(
+        Venue, venue_id, Artist, Shows.venue_id, Shows.artist_id))
+
+
+def artist_stamp(artist_id):
+    return page_cache.stamp('artist:%s' % artist_id, lambda: detail_stamp(
+        Artist, artist_id, Venue, Shows.artist_id, Shows.venue_id))
+
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+    # drop cached venue/artist detail pages after a write
+    page_cache.invalidate(*(['venue:%s' % id for id in venue_ids] +
+                            ['artist:%s' % id for id in artist_ids]))
+
+
+def show_partner_ids(partner_fk, show_fk, id):
+    # ids of the artists playing a venue, or the venues an artist plays; their
+    # pages render this entity's name and image
+    return [row[0] for row in db.session.query(partner_fk).filter(show_fk == id).distinct()]
+
+
+@app.route('/_stats/cache')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+
+@app.route('/_stats/pool')
+def connection_pool_stats():
+    return jsonify(pool_stats(db.engine.pool))
+
+
+#  Genres
+#  ----------------------------------------------------------------
+
+def genres_by_name(names):
+    # Genre rows for the submitted genre names, creating any that are new
+    names = sorted(set(name.strip() for name in names if name and name.strip()))
+    if not names:
+        return []
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    known = set(genre.name for genre in genres)
+    for name in names:
+        if name not in known:
+            genre = Genre(name=name)
+            db.session.add(genre)
+            genres.append(genre)
+    return genres
+
+
+@app.route('/genres/<genre_name>')
+def show_genre(genre_name):
+    # venues and artists by genre are index lookups on the association tables
+    genre = Genre.query.filter_by(name=genre_name).first_or_404()
+    venues = db.session.query(Venue.id, Venue.name).join(
+        venue_genres, venue_genres.c.venue_id == Venue.id).filter(
+        venue_genres.c.genre_id == genre.id).order_by(Venue.name).all()
+    artists = db.session.query(Artist.id, Artist.name).join(
+        artist_genres, artist_genres.c.artist_id == Artist.id).filter(
+        artist_genres.c.genre_id == genre.id).order_by(Artist.name).all()
+    return render_template('pages/genre.html', genre=genre.name, venues=venues, artists=artists)
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_listing():
+    # venues with their precomputed upcoming-show counts, keyset-paged on
+    # (state, city, id)
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+
+VENUE_LISTING_KEY = [Venue.state, Venue.city, Venue.id]
+
+
+def venue_areas(rows):
+    # rows ordered by (state, city) grouped into areas, one area at a time
+    for (city, state), area_rows in groupby(rows, key=lambda r: (r.city, r.state)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": r.id,
+                "name": r.name,
+                "num_upcoming_shows": r.num_upcoming_shows
+            } for r in area_rows]
+        }
+
+
 @app.route('/venues')
+@conditional(venues_stamp)
 def venues():
-    # TODO: replace with real venues data.
-    #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+    # one query returns a page of venues with their precomputed upcoming-show
+    # counts; paging on (state, city, id) keeps each area's venues adjacent so
+    # they can be grouped in a single pass
+    if request.args.get('stream'):
+        # ?stream=1 sends every venue unpaginated, from a server-side cursor
+        rows = venue_listing().order_by(*VENUE_LISTING_KEY).yield_per(app.config['STREAM_BATCH_SIZE'])
+        return stream_page('pages/venues.html', areas=venue_areas(rows), page=None)
+
+    page = None
     try:
-        venues_data = Venue.query.distinct(Venue.city).all()
-        data = []
-
-        for row in venues_data:
-            related_venues = Venue.query.filter_by(city=row.city).all()
-            num_upcoming_shows = Shows.query.filter_by(venue_id=row.id).where(
-                Shows.start_time > current_date_time).count()
-            ven_list = []
-            for r in related_venues:
-                ven_list += [
-                    {
-                        "id": r.id,
-                        "name": r.name,
-                        "num_upcoming_shows": num_upcoming_shows
-                    }
-                ]
-                data += [{
-                    "city": row.city,
-                    "state": row.state,
-                    "venues": ven_list
-                }]
+        page = listing_page(venue_listing(), VENUE_LISTING_KEY)
+    except HTTPException:
+        raise
     except:
         db.session.rollback()
         print(sys.exc_info())
-    finally:
-        db.session.close()
-        return render_template('pages/venues.html', areas=data)
-        # return data
+    return stream_page('pages/venues.html', areas=venue_areas(page or []), page=page)
+
+
+# in-process name indexes, SQLite's stand-in for pg_trgm: built lazily on the
+# first search, kept in sync by this process's create/edit/delete views and
+# rebuilt after NAME_INDEX_TTL seconds to pick up rows written by other
+# workers or `flask import`
+name_indexes = {}
+
+
+def uses_name_index():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def uses_trigram_index():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def name_index(model):
+    built, index = name_indexes.get(model, (None, None))
+    if index is None or time.monotonic() - built > app.config['NAME_INDEX_TTL']:
+        built = time.monotonic()
+        index = TrigramIndex(db.session.query(model.id, model.name))
+        name_indexes[model] = (built, index)
+    return index
+
+
+def update_name_index(model, id, name=None):
+    # name=None drops the row from the index
+    built, index = name_indexes.get(model, (None, None))
+    if index is None:
+        return
+    if name is None:
+        index.remove(id)
+    else:
+        index.add(id, name)
+
+
+def search_rows(model, term, offset=0, limit=None):
+    # (count, rows) for the matches, with their precomputed upcoming-show
+    # counts, in one query; `offset` and `limit` select a slice of them
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+    if uses_name_index():
+        ids = name_index(model).search(term)
+        count = len(ids)
+        ids = ids[offset:None if limit is None else offset + limit]
+        rank = dict((id, i) for i, id in enumerate(ids))
+        rows = sorted(query.filter(model.id.in_(ids)).all(), key=lambda row: rank[row.id])
+        return count, iter(rows)
+
+    # on PostgreSQL ILIKE is served by the gin_trgm_ops index, ranked by
+    # similarity; the window count puts the total on every row, so it is known
+    # from the first row while the rest are still streaming from the cursor
+    query = query.add_columns(db.func.count().over().label('total')).filter(
+        model.name.ilike('%' + escape_like(term) + '%', escape='\\'))
+    if uses_trigram_index():
+        query = query.order_by(db.func.similarity(model.name, term).desc(), model.name, model.id)
+    else:
+        query = query.order_by(model.name, model.id)
+    if offset or limit is not None:
+        query = query.offset(offset).limit(limit)
+    rows = iter(query.yield_per(app.config['STREAM_BATCH_SIZE']))
+    first = next(rows, None)
+    if first is None:
+        return 0, iter(())
+    return first.total, chain([first], rows)
+
+
+def search_item(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+    }
+
+
+def search_page(model, term):
+    # (count, page) of the matches for the ?after= / ?before= / ?limit= args
+    limit = page_limit()
+    try:
+        if request.args.get('before'):
+            end = decode_offset(request.args['before'])
+            offset = max(end - limit, 0)
+            limit = end - offset
+        else:
+            offset = decode_offset(request.args['after']) if request.args.get('after') else 0
+    except ValueError:
+        abort(400)
+    count, rows = search_rows(model, term, offset, limit + 1)
+    items = [search_item(row) for row in rows]
+    return count, Page(items[:limit],
+                       next_cursor=encode_offset(offset + limit) if len(items) > limit else None,
+                       prev_cursor=encode_offset(offset) if offset else None)
+
+
+def stream_search_results(model, term, template_name):
+    count, rows = search_rows(model, term)
+    results = {"count": count, "data": (search_item(row) for row in rows)}
+    return stream_page(template_name, results=results, search_term=term)
 
 
 @app.route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     term = request.form.get('search_term', '')
-    venues = Venue.query.filter(Venue.name.like('%{t}%'.format(t=term))).all()
-    count_venues = Venue.query.filter(
-        Venue.name.like('%{t}%'.format(t=term))).count()
-    search_data = []
-
-    for row in venues:
-        num_upcoming_shows = Shows.query.filter_by(venue_id=row.id).where(
-            Shows.start_time > current_date_time).count()
-        search_data += [{
-            "id": row.id,
-            "name": row.name,
-            "num_upcoming_shows": num_upcoming_shows
-        }]
-
-    response = {
-        "count": count_venues,
-        "data": search_data
-    }
-    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+    return stream_search_results(Venue, term, 'pages/search_venues.html')
 
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # shows the venue page with the given venue_id
-    # TODO: replace with real venue data from the venues table, using venue_id
-    venue = Venue.query.get(venue_id)
-    upcoming_shows = []
-    past_shows = []
+def genre_names_query(association, owner_clause):
+    # the genre names of one venue/artist, as a statement for async_reads
+    return db.select(Genre.name).join(association, association.c.genre_id == Genre.id).where(
+        owner_clause).order_by(Genre.name)
 
-    # genres data into list
-    venue_genres = venue.genres
-    venue_genres = venue_genres.translate({ord('{'): None})
-    venue_genres = venue_genres.translate({ord('}'): None})
-    genres = venue_genres.split(",")
-    print(genres)
-    # upcoming shows query
-    up_shows_query = Shows.query.with_entities(Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time).filter_by(
-        venue_id=venue_id).where(Shows.start_time > current_date_time).join(Artist).all()
-    pa_shows_query = Shows.query.with_entities(Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time).filter_by(
-        venue_id=venue_id).where(Shows.start_time < current_date_time).join(Artist).all()
-    upcoming_shows_count = Shows.query.with_entities(Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time).filter_by(
-        venue_id=venue_id).where(Shows.start_time > current_date_time).join(Artist).count()
-    past_shows_count = Shows.query.with_entities(Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time).filter_by(
-        venue_id=venue_id).where(Shows.start_time < current_date_time).join(Artist).count()
-
-    for row in up_shows_query:
-        upcoming_shows += [{
-            "artist_id": row.artist_id,
-            "artist_name": row.name,
-            "artist_image_link": row.image_link,
-            "start_time": str(row.start_time)
-        }]
 
-    for row in pa_shows_query:
-        past_shows += [{
+def split_shows(rows, now):
+    # partition show rows into (past, upcoming) in a single pass
+    past_shows = []
+    upcoming_shows = []
+    for row in rows:
+        if row.start_time > now:
+            upcoming_shows.append(row)
+        else:
+            past_shows.append(row)
+    return past_shows, upcoming_shows
+
+
+def venue_detail(venue_id):
+    # the venue page data; shared by the HTML view and the API
+    now = show_time_now()
+
+    # all of the venue's shows in one query, split into past/upcoming here
+    shows_query = db.session.query(
+        Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time
+    ).join(Artist, Artist.id == Shows.artist_id).filter(
+        Shows.venue_id == venue_id).order_by(Shows.start_time)
+
+    if async_reads.enabled:
+        venue_rows, genre_rows, show_rows = async_reads.gather(
+            db.select(Venue.__table__).where(Venue.id == venue_id),
+            genre_names_query(venue_genres, venue_genres.c.venue_id == venue_id),
+            shows_query.statement)
+        if not venue_rows:
+            abort(404)
+        venue = venue_rows[0]
+        genres = [row.name for row in genre_rows]
+    else:
+        venue = Venue.query.get_or_404(venue_id)
+        genres = [genre.name for genre in venue.genres]
+        show_rows = shows_query.all()
+    past_rows, upcoming_rows = split_shows(show_rows, now)
+
+    def show_data(row):
+        return {
             "artist_id": row.artist_id,
             "artist_name": row.name,
             "artist_image_link": row.image_link,
-            "start_time": str(row.start_time)
-        }]
-
-        data = {
-            "id": venue.id,
-            "name": venue.name,
-            "genres": genres,
-            "address": venue.address,
-            "city": venue.city,
-            "state": venue.state,
-            "phone": venue.phone,
-            "website": venue.website_link,
-            "facebook_link": venue.facebook_link,
-            "seeking_talent": venue.seeking_talent,
-            "seeking_description": venue.seeking_description,
-            "image_link": venue.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": past_shows_count,
-            "upcoming_shows_count": upcoming_shows_count,
+            "start_time": row.start_time
         }
-        return render_template('pages/show_venue.html', venue=data)
+
+    past_shows = [show_data(row) for row in past_rows]
+    upcoming_shows = [show_data(row) for row in upcoming_rows]
+
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
+    }
+    return data
+
+
+@app.route('/venues/<int:venue_id>')
+@conditional(venue_stamp)
+@page_cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    return render_template('pages/show_venue.html', venue=venue_detail(venue_id))
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -259,7 +796,7 @@ def create_venue_submission():
         state = request.form.get('state')
         address = request.form.get('address')
         phone = request.form.get('phone')
-        genres = request.form.getlist('genres')
+        genres = genres_by_name(request.form.getlist('genres'))
         facebook_link = request.form.get('facebook_link')
         image_link = request.form.get('image_link')
         website_link = request.form.get('website_link')
@@ -286,7 +823,9 @@ def create_venue_submission():
 
         db.session.add(venue)
         db.session.flush()
+        venue_id = venue.id
         db.session.commit()
+        update_name_index(Venue, venue_id, name)
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     except:
         error = True
@@ -307,102 +846,93 @@ def delete_venue(venue_id):
 
     # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
     # clicking that button delete it from the db then redirect the user to the homepage
+    error = False
     try:
         venue = Venue.query.get(venue_id)
+        deleted_id = venue.id
+        artist_ids = show_partner_ids(Shows.artist_id, Shows.venue_id, deleted_id)
+        uncount_venue_shows(deleted_id)
         db.session.delete(venue)
         db.session.commit()
+        update_name_index(Venue, deleted_id)
+        invalidate_pages(venue_ids=[deleted_id], artist_ids=artist_ids)
     except:
+        error = True
         db.session.rollback()
+        print(sys.exc_info())
     finally:
         db.session.close()
-        return
+    if error:
+        abort(400)
+    return jsonify({'success': True})
 
 #  Artists
 #  ----------------------------------------------------------------
 
 
+def artist_listing():
+    return Artist.query.with_entities(Artist.id, Artist.name)
+
+
 @app.route('/artists')
+@conditional(artists_stamp)
 def artists():
     # TODO: replace with real data returned from querying the database
-    artists = Artist.query.with_entities(Artist.id, Artist.name).all()
-    data = []
-    for row in artists:
-        data += [{
-            "id": row.id,
-            "name": row.name
-        }]
-    return render_template('pages/artists.html', artists=data)
+    if request.args.get('stream'):
+        # ?stream=1 sends every artist unpaginated, from a server-side cursor
+        rows = artist_listing().order_by(Artist.id).yield_per(app.config['STREAM_BATCH_SIZE'])
+        page = None
+    else:
+        rows = page = listing_page(artist_listing(), [Artist.id])
+    data = ({"id": row.id, "name": row.name} for row in rows)
+    return stream_page('pages/artists.html', artists=data, page=page)
 
 
 @app.route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     term = request.form.get('search_term', '')
-    artists = Artist.query.filter(
-        Artist.name.like('%{t}%'.format(t=term))).all()
-    count_artist = Artist.query.filter(
-        Artist.name.like('%{t}%'.format(t=term))).count()
-    search_data = []
-
-    for row in artists:
-        num_upcoming_shows = Shows.query.filter_by(artist_id=row.id).where(
-            Shows.start_time > current_date_time).count()
-        search_data += [{
-            "id": row.id,
-            "name": row.name,
-            "num_upcoming_shows": num_upcoming_shows
-        }]
-
-    response = {
-        "count": count_artist,
-        "data": search_data
-    }
-    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-    # shows the artist page with the given artist_id
-    # TODO: replace with real artist data from the artist table, using artist_id
-    artist = Artist.query.get(artist_id)
-    print(artist.seeking_venues)
-    upcoming_shows = []
-    past_shows = []
+    return stream_search_results(Artist, term, 'pages/search_artists.html')
+
+
+def artist_detail(artist_id):
+    # the artist page data; shared by the HTML view and the API
+    now = show_time_now()
+
+    # all of the artist's shows in one query, split into past/upcoming here
+    shows_query = db.session.query(
+        Shows.venue_id, Venue.name, Venue.image_link, Shows.start_time
+    ).join(Venue, Venue.id == Shows.venue_id).filter(
+        Shows.artist_id == artist_id).order_by(Shows.start_time)
+
+    if async_reads.enabled:
+        artist_rows, genre_rows, show_rows = async_reads.gather(
+            db.select(Artist.__table__).where(Artist.id == artist_id),
+            genre_names_query(artist_genres, artist_genres.c.artist_id == artist_id),
+            shows_query.statement)
+        if not artist_rows:
+            abort(404)
+        artist = artist_rows[0]
+        genres = [row.name for row in genre_rows]
+    else:
+        artist = Artist.query.get_or_404(artist_id)
+        genres = [genre.name for genre in artist.genres]
+        show_rows = shows_query.all()
+    past_rows, upcoming_rows = split_shows(show_rows, now)
 
-    # genres data into list
-    artist_genres = artist.genres
-    artist_genres = artist_genres.translate({ord('{'): None})
-    artist_genres = artist_genres.translate({ord('}'): None})
-    genres = artist_genres.split(",")
-
-    # upcoming shows query
-    up_shows_query = Shows.query.with_entities(Shows.artist_id, Venue.name, Venue.image_link, Shows.start_time).filter_by(
-        artist_id=artist_id).where(Shows.start_time > current_date_time).join(Venue).all()
-    pa_shows_query = Shows.query.with_entities(Shows.artist_id, Venue.name, Venue.image_link, Shows.start_time).filter_by(
-        artist_id=artist_id).where(Shows.start_time < current_date_time).join(Venue).all()
-
-    upcoming_shows_count = Shows.query.with_entities(Shows.artist_id, Venue.name, Venue.image_link, Shows.start_time).filter_by(
-        artist_id=artist_id).where(Shows.start_time > current_date_time).join(Venue).count()
-    past_shows_count = Shows.query.with_entities(Shows.artist_id, Venue.name, Venue.image_link, Shows.start_time).filter_by(
-        artist_id=artist_id).where(Shows.start_time > current_date_time).join(Venue).count()
-
-    for row in up_shows_query:
-        upcoming_shows += [{
-            "venue_id": row.artist_id,
+    def show_data(row):
+        return {
+            "venue_id": row.venue_id,
             "venue_name": row.name,
             "venue_image_link": row.image_link,
-            "start_time": str(row.start_time)
-        }]
+            "start_time": row.start_time
+        }
 
-    for row in pa_shows_query:
-        past_shows += [{
-            "venue_id": row.artist_id,
-            "venue_name": row.name,
-            "venue_image_link": row.image_link,
-            "start_time": str(row.start_time)
-        }]
+    past_shows = [show_data(row) for row in past_rows]
+    upcoming_shows = [show_data(row) for row in upcoming_rows]
 
     data = {
         "id": artist.id,
@@ -419,10 +949,18 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": past_shows_count,
-        "upcoming_shows_count": upcoming_shows_count,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows),
     }
-    return render_template('pages/show_artist.html', artist=data)
+    return data
+
+
+@app.route('/artists/<int:artist_id>')
+@conditional(artist_stamp)
+@page_cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    return render_template('pages/show_artist.html', artist=artist_detail(artist_id))
 
 #  Update
 #  ----------------------------------------------------------------
@@ -433,11 +971,7 @@ def edit_artist(artist_id):
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
 
-    # genres data into list
-    artist_genres = artist.genres
-    artist_genres = artist_genres.translate({ord('{'): None})
-    artist_genres = artist_genres.translate({ord('}'): None})
-    genres = artist_genres.split(",")
+    genres = [genre.name for genre in artist.genres]
 
     artist = {
         "id": artist.id,
@@ -476,15 +1010,18 @@ def edit_artist_submission(artist_id):
             Artist.state: request.form.get('state'),
             Artist.city: request.form.get('city'),
             Artist.phone: request.form.get('phone'),
-            Artist.genres: request.form.getlist('genres'),
             Artist.facebook_link: request.form.get('facebook_link'),
             Artist.image_link: request.form.get('image_link'),
             Artist.website_link: request.form.get('website_link'),
             Artist.seeking_venues: seeking_venue_bool,
             Artist.seeking_description: request.form.get('seeking_description')
         }, synchronize_session=False)
+        artist.genres = genres_by_name(request.form.getlist('genres'))
 
+        venue_ids = show_partner_ids(Shows.venue_id, Shows.artist_id, artist_id)
         db.session.commit()
+        update_name_index(Artist, artist_id, request.form.get('name'))
+        invalidate_pages(venue_ids=venue_ids, artist_ids=[artist_id])
         flash('Artist ' + old_artist_name + ' was successfully updated!')
     except:
         print('Artist Updating failed')
@@ -500,11 +1037,7 @@ def edit_venue(venue_id):
     form = VenueForm()
     venue = Venue.query.get(venue_id)
 
-    # genres data into list
-    venue_genres = venue.genres
-    venue_genres = venue_genres.translate({ord('{'): None})
-    venue_genres = venue_genres.translate({ord('}'): None})
-    genres = venue_genres.split(",")
+    genres = [genre.name for genre in venue.genres]
 
     venue = {
         "id": venue.id,
@@ -545,15 +1078,18 @@ def edit_venue_submission(venue_id):
             Venue.city: request.form.get('city'),
             Venue.address: request.form.get('address'),
             Venue.phone: request.form.get('phone'),
-            Venue.genres: request.form.getlist('genres'),
             Venue.facebook_link: request.form.get('facebook_link'),
             Venue.image_link: request.form.get('image_link'),
             Venue.website_link: request.form.get('website_link'),
             Venue.seeking_talent: seeking_talent_bool,
             Venue.seeking_description: request.form.get('seeking_description')
         }, synchronize_session=False)
+        venue.genres = genres_by_name(request.form.getlist('genres'))
 
+        artist_ids = show_partner_ids(Shows.artist_id, Shows.venue_id, venue_id)
         db.session.commit()
+        update_name_index(Venue, venue_id, request.form.get('name'))
+        invalidate_pages(venue_ids=[venue_id], artist_ids=artist_ids)
         flash('Venue ' + old_venue_name + ' was successfully updated!')
     except:
         db.session.rollback()
@@ -583,7 +1119,7 @@ def create_artist_submission():
         city = request.form.get('city')
         state = request.form.get('state')
         phone = request.form.get('phone')
-        genres = request.form.getlist('genres')
+        genres = genres_by_name(request.form.getlist('genres'))
         facebook_link = request.form.get('facebook_link')
         image_link = request.form.get('image_link')
         website_link = request.form.get('website_link')
@@ -609,7 +1145,9 @@ def create_artist_submission():
 
         db.session.add(artist)
         db.session.flush()
+        artist_id = artist.id
         db.session.commit()
+        update_name_index(Artist, artist_id, name)
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     except:
         error = True
@@ -626,37 +1164,43 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
+def shows_feed():
+    # every show joined to its venue and artist, selecting only the columns
+    # the shows template needs
+    return db.session.query(
+        Shows.id,
+        Shows.venue_id,
+        Venue.name.label('venue_name'),
+        Shows.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Shows.start_time
+    ).join(Venue, Venue.id == Shows.venue_id).join(Artist, Artist.id == Shows.artist_id)
+
+
+def show_item(row):
+    return {
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    }
+
+
 @app.route('/shows')
+@conditional(shows_stamp)
 def shows():
     # displays list of shows at /shows
-    # TODO: replace with real venues data.
-    data = []
-    shows = Shows.query.all()
-
-    for row in shows:
-        data += [{
-            "venue_id": row.venue_id,
-            "venue_name": "",
-            "artist_id": row.artist_id,
-            "artist_name": "",
-            "artist_image_link": "",
-            "start_time": str(row.start_time)
-        }]
-
-    artist = Artist.query.with_entities(Artist.name, Artist.image_link).filter_by(id=Shows.artist_id).join(Shows).all()
-    for i in range(len(data)):
-        for row in artist:
-            data[i]["artist_name"] = row.name,
-            data[i]["artist_image_link"] = row.image_link
-            
-
-    venue = Venue.query.with_entities(Venue.name).where(Shows.venue_id == Venue.id).join(Shows).all()
-    for i in range(len(data)):
-        for row in venue:
-            data[i]["venue_name"] = row.name
-            
-    return render_template('pages/shows.html', shows=data)
+    if request.args.get('stream'):
+        # ?stream=1 sends the whole feed unpaginated, rendering rows as they
+        # are read from a server-side cursor
+        rows = shows_feed().order_by(Shows.start_time, Shows.id).yield_per(app.config['STREAM_BATCH_SIZE'])
+        return stream_page('pages/shows.html', shows=(show_item(row) for row in rows), page=None)
 
+    page = listing_page(shows_feed(), [Shows.start_time, Shows.id])
+    return stream_page('pages/shows.html', shows=(show_item(row) for row in page), page=page)
 
 
 @app.route('/shows/create')
@@ -673,7 +1217,7 @@ def create_show_submission():
     try:
         artist_id = request.form.get('artist_id')
         venue_id = request.form.get('venue_id')
-        start_time = request.form.get('start_time')
+        start_time = dateutil.parser.parse(request.form.get('start_time'))
 
         artists = db.session.query(Artist).filter(
             Artist.id == artist_id).count()
@@ -683,18 +1227,20 @@ def create_show_submission():
             show = Shows(
                 artist_id=artist_id,
                 venue_id=venue_id,
-                start_time=format_datetime(start_time, 'full')
+                start_time=start_time
             )
             db.session.add(show)
+            count_new_show(artist_id, venue_id, start_time)
             db.session.flush()
             db.session.commit()
+            invalidate_pages(venue_ids=[venue_id], artist_ids=[artist_id])
             flash('Show was successfully listed!')
         else:
             flash('An error occurred. Show could not be listed.')
 
     except:
         error = True
-        # db.session.rollback()
+        db.session.rollback()
         print(sys.exc_info())
     finally:
         db.session.close()
@@ -707,6 +1253,192 @@ def create_show_submission():
         return render_template('pages/home.html')
 
 
+#  Export
+#  ----------------------------------------------------------------
+
+EXPORT_COLUMNS = {
+    'venues': [Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+               Venue.facebook_link, Venue.image_link, Venue.website_link, Venue.seeking_talent,
+               Venue.seeking_description, Venue.upcoming_shows_count, Venue.past_shows_count,
+               Venue.updated_at],
+    'artists': [Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+                Artist.facebook_link, Artist.image_link, Artist.website_link, Artist.seeking_venues,
+                Artist.seeking_description, Artist.upcoming_shows_count, Artist.past_shows_count,
+                Artist.updated_at],
+    'shows': [Shows.id, Shows.artist_id, Shows.venue_id, Shows.start_time, Shows.updated_at],
+}
+
+
+def parse_since(value):
+    # ISO 8601 timestamp -> naive UTC, the form updated_at is stored in
+    since = dateutil.parser.isoparse(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+# venues and artists are exported with their genres, so `flask import` can
+# load the files back
+EXPORT_GENRES = {
+    'venues': (venue_genres, venue_genres.c.venue_id, Venue.id),
+    'artists': (artist_genres, artist_genres.c.artist_id, Artist.id),
+}
+
+
+def genre_list(association, owner_fk, owner_id):
+    # comma separated genre names of each row, as a correlated subquery
+    if db.engine.dialect.name == 'postgresql':
+        names = db.func.string_agg(Genre.name, ',')
+    else:
+        names = db.func.group_concat(Genre.name, ',')
+    return db.select(names).select_from(
+        association.join(Genre, Genre.id == association.c.genre_id)
+    ).where(owner_fk == owner_id).scalar_subquery()
+
+
+def export_rows(kind, since=None):
+    # (column names, rows) for one table, read through a server-side cursor;
+    # `since` limits the export to rows written after that time
+    columns = EXPORT_COLUMNS[kind]
+    model = columns[0].class_
+    names = [column.key for column in columns]
+    query = db.session.query(*columns)
+    if kind in EXPORT_GENRES:
+        query = query.add_columns(genre_list(*EXPORT_GENRES[kind]).label('genres'))
+        names.append('genres')
+    if since is not None:
+        query = query.filter(model.updated_at > since)
+    rows = query.order_by(model.id).yield_per(app.config['EXPORT_BATCH_SIZE'])
+    return names, rows
+
+
+# ----------------------------------------------------------------------------#
+# API.
+# ----------------------------------------------------------------------------#
+
+# JSON versions of the read views under /api/v1, built from the same query
+# helpers. List endpoints are keyset paginated like the HTML listings
+# (?after=, ?before=, ?limit=) and every endpoint accepts ?fields=a,b.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_SCHEMA = Schema('id', 'name', 'city', 'state', 'num_upcoming_shows')
+ARTIST_SCHEMA = Schema('id', 'name')
+SHOW_SCHEMA = Schema('venue_id', 'venue_name', 'artist_id', 'artist_name',
+                     'artist_image_link', 'start_time')
+SEARCH_RESULT_SCHEMA = Schema('id', 'name', 'num_upcoming_shows', source='item')
+VENUE_DETAIL_SCHEMA = Schema(
+    'id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+    'facebook_link', 'seeking_talent', 'seeking_description', 'image_link',
+    'past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count',
+    source='item')
+ARTIST_DETAIL_SCHEMA = Schema(
+    'id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+    'facebook_link', 'seeking_venue', 'seeking_description', 'image_link',
+    'past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count',
+    source='item')
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def requested_serializer(schema):
+    try:
+        return schema.serializer(request.args.get('fields'))
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def page_response(schema, page):
+    serialize = requested_serializer(schema)
+    return json_response({
+        "data": [serialize(row) for row in page],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor
+    })
+
+
+@api.route('/venues')
+@conditional(venues_stamp)
+def api_venues():
+    return page_response(VENUE_SCHEMA, listing_page(venue_listing(), VENUE_LISTING_KEY))
+
+
+@api.route('/venues/<int:venue_id>')
+@conditional(venue_stamp)
+def api_venue(venue_id):
+    return json_response(requested_serializer(VENUE_DETAIL_SCHEMA)(venue_detail(venue_id)))
+
+
+@api.route('/artists')
+@conditional(artists_stamp)
+def api_artists():
+    return page_response(ARTIST_SCHEMA, listing_page(artist_listing(), [Artist.id]))
+
+
+@api.route('/artists/<int:artist_id>')
+@conditional(artist_stamp)
+def api_artist(artist_id):
+    return json_response(requested_serializer(ARTIST_DETAIL_SCHEMA)(artist_detail(artist_id)))
+
+
+@api.route('/shows')
+@conditional(shows_stamp)
+def api_shows():
+    return page_response(SHOW_SCHEMA, listing_page(shows_feed(), [Shows.start_time, Shows.id]))
+
+
+def search_response(model):
+    serialize = requested_serializer(SEARCH_RESULT_SCHEMA)
+    count, page = search_page(model, request.args.get('q', ''))
+    return json_response({
+        "count": count,
+        "data": [serialize(item) for item in page],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor
+    })
+
+
+@api.route('/search/venues')
+def api_search_venues():
+    return search_response(Venue)
+
+
+@api.route('/search/artists')
+def api_search_artists():
+    return search_response(Artist)
+
+
+@api.route('/export/<kind>')
+def api_export(kind):
+    # ?format=csv|ndjson, ?since=<ISO timestamp> for an incremental export
+    fmt = request.args.get('format', 'ndjson')
+    if kind not in EXPORT_COLUMNS or fmt not in STREAM_FORMATS:
+        abort(404)
+    try:
+        since = parse_since(request.args['since']) if request.args.get('since') else None
+    except ValueError:
+        abort(400, 'since must be an ISO 8601 timestamp')
+    mimetype, chunks = STREAM_FORMATS[fmt]
+    columns, rows = export_rows(kind, since)
+    response = Response(stream_with_context(chunks(columns, rows)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (kind, fmt)
+    return response
+
+
+# the app's HTML 404/500 handlers are code specific, so they are overridden
+# here by code as well
+@api.errorhandler(HTTPException)
+@api.errorhandler(404)
+@api.errorhandler(500)
+def api_error(error):
+    return json_response({"error": error.name, "message": error.description}, error.code)
+
+
+app.register_blueprint(api)
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -717,6 +1449,176 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+counters_cli = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+
+@counters_cli.command('rollover')
+def counters_rollover_command():
+    # meant to run periodically (e.g. from cron) so listing counts follow time
+    moved = roll_over_show_counters(show_time_now())
+    click.echo('Rolled over %d show(s) from upcoming to past.' % moved)
+
+
+@counters_cli.command('rebuild')
+def counters_rebuild_command():
+    rebuild_show_counters(show_time_now())
+    click.echo('Rebuilt show counters for all venues and artists.')
+
+
+app.cli.add_command(counters_cli)
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+@assets_cli.command('build')
+def assets_build_command():
+    # restart the workers afterwards so they pick up the new manifest
+    manifest = assets.build(app.static_folder)
+    for name in sorted(manifest):
+        click.echo('%s -> %s' % (name, manifest[name]))
+
+
+app.cli.add_command(assets_cli)
+
+
+VENUE_IMPORT_FIELDS = ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                       'website_link', 'seeking_talent', 'seeking_description')
+ARTIST_IMPORT_FIELDS = ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                        'website_link', 'seeking_description')
+
+
+def import_entities(model, form_class, records, report, chunk_size):
+    # venues/artists: one commit per chunk, genres resolved once per chunk
+    for chunk in chunked(records, chunk_size):
+        valid = []
+        for number, record in chunk:
+            if model is Artist and 'seeking_venues' in record:
+                # the column name, as `flask export artists` writes it
+                record = dict(record)
+                record.setdefault('seeking_venue', record.pop('seeking_venues'))
+            form, errors = validate(form_class, record, list_fields=('genres',),
+                                    boolean_fields=('seeking_talent', 'seeking_venue'))
+            if errors:
+                report.reject(number, record, errors)
+            else:
+                valid.append(form.data)
+        genres = dict((genre.name, genre) for genre in
+                      genres_by_name([name for data in valid for name in data['genres']]))
+        for data in valid:
+            if model is Venue:
+                fields = dict((f, data[f]) for f in VENUE_IMPORT_FIELDS)
+            else:
+                fields = dict((f, data[f]) for f in ARTIST_IMPORT_FIELDS)
+                fields['seeking_venues'] = data['seeking_venue']
+            db.session.add(model(genres=[genres[name] for name in data['genres']], **fields))
+        db.session.commit()
+        report.loaded += len(valid)
+        click.echo('... %d loaded, %d rejected' % (report.loaded, report.rejected), err=True)
+
+
+def existing_ids(model, ids):
+    if not ids:
+        return set()
+    return set(id for (id,) in db.session.query(model.id).filter(model.id.in_(ids)))
+
+
+def import_shows(records, report, chunk_size):
+    # shows: foreign keys resolved with one query per table per chunk, rows
+    # written with COPY on PostgreSQL and an executemany INSERT elsewhere
+    use_copy = db.engine.dialect.name == 'postgresql' and db.engine.driver == 'psycopg2'
+    for chunk in chunked(records, chunk_size):
+        candidates = []
+        for number, record in chunk:
+            # checked here rather than with ShowForm, whose start_time only
+            # reads one format and falls back to a default when it is missing
+            errors = {}
+            try:
+                artist_id, venue_id = int(record.get('artist_id')), int(record.get('venue_id'))
+            except (TypeError, ValueError):
+                errors['artist_id'] = ['artist_id and venue_id must be integer ids']
+            try:
+                start_time = parse_datetime(record.get('start_time'))
+            except ValueError as e:
+                errors['start_time'] = [str(e)]
+            if errors:
+                report.reject(number, record, errors)
+                continue
+            candidates.append((number, record, artist_id, venue_id, start_time))
+
+        artist_ids = existing_ids(Artist, set(c[2] for c in candidates))
+        venue_ids = existing_ids(Venue, set(c[3] for c in candidates))
+        rows = []
+        for number, record, artist_id, venue_id, start_time in candidates:
+            if artist_id not in artist_ids:
+                report.reject(number, record, {'artist_id': ['no artist with this id']})
+            elif venue_id not in venue_ids:
+                report.reject(number, record, {'venue_id': ['no venue with this id']})
+            else:
+                rows.append((artist_id, venue_id, start_time))
+
+        if rows:
+            # both paths stamp updated_at the way the ORM does, rather than
+            # leaving it to the server default
+            now = datetime.utcnow()
+            if use_copy:
+                copy_rows(db.session.connection().connection, 'shows',
+                          ('artist_id', 'venue_id', 'start_time', 'updated_at'), [row + (now,) for row in rows])
+            else:
+                db.session.execute(Shows.__table__.insert(), [
+                    {'artist_id': a, 'venue_id': v, 'start_time': t, 'updated_at': now} for a, v, t in rows])
+            count_new_shows(rows)
+            db.session.commit()
+            invalidate_pages(venue_ids=set(r[1] for r in rows), artist_ids=set(r[0] for r in rows))
+        report.loaded += len(rows)
+        click.echo('... %d loaded, %d rejected' % (report.loaded, report.rejected), err=True)
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORT_COLUMNS)))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'parquet']), default='csv', show_default=True)
+@click.option('--since', help='Only export rows updated after this ISO 8601 timestamp.')
+@click.option('--output', '-o', default='-', help='Output file; standard output by default.')
+def export_command(kind, fmt, since, output):
+    """Stream venues, artists or shows to CSV, NDJSON or Parquet."""
+    try:
+        since = parse_since(since) if since else None
+    except ValueError:
+        raise click.BadParameter('must be an ISO 8601 timestamp', param_hint='--since')
+    columns, rows = export_rows(kind, since)
+    if fmt == 'parquet':
+        if output == '-':
+            raise click.BadParameter('Parquet output needs a file', param_hint='--output')
+        write_parquet(output, columns, rows, app.config['EXPORT_BATCH_SIZE'])
+        return
+    with click.open_file(output, 'w') as f:
+        for chunk in STREAM_FORMATS[fmt][1](columns, rows):
+            f.write(chunk)
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and written per transaction.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows and their errors to this NDJSON file.')
+def import_command(kind, path, fmt, chunk_size, rejects):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+    report = ImportReport(rejects)
+    records = read_records(path, fmt, report)
+    if kind == 'venues':
+        import_entities(Venue, VenueForm, records, report, chunk_size)
+    elif kind == 'artists':
+        import_entities(Artist, ArtistForm, records, report, chunk_size)
+    else:
+        import_shows(records, report, chunk_size)
+    click.echo(report.summary())
+
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
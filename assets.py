@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# ----------------------------------------------------------------------------#
+# Static assets.
+# ----------------------------------------------------------------------------#
+
+# `flask assets build` concatenates and minifies each bundle into a content
+# hashed file under static/build/ (plus .gz and, with the optional brotli
+# package, .br copies) and records the names in static/build/manifest.json.
+# Templates link assets through asset_urls()/asset_url(): the hashed file
+# once the build has run, the source files before that. Hashed files are
+# served with a one year, immutable Cache-Control.
+# Remove static/build/ now and then to drop files from old builds.
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+
+# bundle name -> source files under static/, in load order
+BUNDLES = {
+    'app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js',
+    ],
+    'app.js': [
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# single files that are fingerprinted as they are
+FILES = [
+    'img/front-splash.jpg',
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/respond-1.4.2.min.js',
+]
+
+# precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('.css', '.js', '.svg')
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(source):
+    # comments (except /*! licence headers */) and redundant whitespace
+    source = CSS_COMMENT.sub('', source)
+    source = CSS_SPACE.sub(' ', source)
+    return CSS_PUNCTUATION.sub(r'\1', source).strip()
+
+
+def minify_js(source):
+    # needs the optional rjsmin package; already minified libraries pass
+    # through unchanged either way
+    if rjsmin is None:
+        return source
+    return rjsmin.jsmin(source, keep_bang_comments=True)
+
+
+def fingerprinted(name, content):
+    root, ext = os.path.splitext(name)
+    return '%s.%s%s' % (root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def bundle(static_folder, name, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            parts.append(minify_css(text))
+        else:
+            parts.append(text if source.endswith('.min.js') else minify_js(text))
+    # the ; guards against a file relying on automatic semicolon insertion
+    return ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+
+
+def write_asset(build_folder, name, content, level):
+    path = os.path.join(build_folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if not name.endswith(COMPRESSIBLE):
+        return
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=level))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def build(static_folder, bundles=BUNDLES, files=FILES, level=9):
+    # writes static/build/ and returns the manifest; files from earlier
+    # builds are kept for pages (and 304s) that still reference them
+    build_folder = os.path.join(static_folder, BUILD_DIR)
+    os.makedirs(build_folder, exist_ok=True)
+    manifest = {}
+    for name, sources in bundles.items():
+        content = bundle(static_folder, name, sources)
+        manifest[name] = fingerprinted(name, content)
+        write_asset(build_folder, manifest[name], content, level)
+    for name in files:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            content = f.read()
+        manifest[name] = fingerprinted(name, content)
+        write_asset(build_folder, manifest[name], content, level)
+    with open(os.path.join(build_folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.app = app
+        self.load()
+        app.jinja_env.globals.update(asset_url=self.asset_url, asset_urls=self.asset_urls)
+        self._send_static = app.view_functions['static']
+        app.view_functions['static'] = self.send_static
+        app.extensions['assets'] = self
+
+    def load(self):
+        path = os.path.join(self.app.static_folder, BUILD_DIR, MANIFEST)
+        try:
+            with open(path) as f:
+                self.manifest = dict((name, BUILD_DIR + '/' + built) for name, built in json.load(f).items())
+        except FileNotFoundError:
+            self.manifest = {}
+
+    def asset_url(self, filename):
+        return url_for('static', filename=self.manifest.get(filename, filename))
+
+    def asset_urls(self, name):
+        # the built bundle, or its source files when it has not been built
+        if name in self.manifest:
+            return [url_for('static', filename=self.manifest[name])]
+        return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+    def send_static(self, filename):
+        if not filename.startswith(BUILD_DIR + '/'):
+            return self._send_static(filename=filename)
+        # the name changes whenever the content does, so it never goes stale
+        options = {
+            'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'max_age': self.app.config['ASSETS_MAX_AGE'],
+        }
+        folder = self.app.static_folder
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+                response = send_from_directory(folder, filename + suffix, **options)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(folder, filename, **options)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        return response
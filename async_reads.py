@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+
+# ----------------------------------------------------------------------------#
+# Async reads.
+# ----------------------------------------------------------------------------#
+
+# With ASYNC_READS set, read views can hand several independent SELECTs to
+# gather(), which runs them concurrently on SQLAlchemy's asyncio engine
+# (asyncpg on PostgreSQL), each on its own pooled connection. The event loop
+# lives in a background thread of each worker process, so the Flask views
+# themselves stay synchronous. The statements do not share a transaction.
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    # the asyncio driver URL for a sync database URL
+    scheme, rest = url.split('://', 1)
+    dialect = scheme.split('+', 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise RuntimeError('ASYNC_READS does not support %s databases' % dialect)
+    return '%s://%s' % (ASYNC_DRIVERS[dialect], rest)
+
+
+class AsyncReader(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        self._engine = None
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_READS', False)
+        app.config.setdefault('ASYNC_DATABASE_URL', None)
+        app.config.setdefault('ASYNC_READS_TIMEOUT', 30)
+        app.extensions['async_reads'] = self
+        self.app = app
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['ASYNC_READS']
+
+    def _start(self):
+        # one loop and engine per process, started on first use (so after a
+        # gunicorn fork)
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+            try:
+                from sqlalchemy.ext.asyncio import create_async_engine
+            except ImportError:
+                raise RuntimeError('ASYNC_READS needs SQLAlchemy 1.4+ with greenlet installed')
+            config = self.app.config
+            url = config['ASYNC_DATABASE_URL'] or async_url(config['SQLALCHEMY_DATABASE_URI'])
+            options = {}
+            if not url.startswith('sqlite'):
+                # same pool sizing as the sync engine, with the asyncio pool class
+                options = dict((key, value) for key, value in config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+                               if key != 'poolclass')
+            try:
+                engine = create_async_engine(url, **options)
+            except ImportError as e:
+                raise RuntimeError('ASYNC_READS is set but its database driver is not installed (%s)' % e)
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-reads', daemon=True).start()
+            self._engine, self._loop, self._pid = engine, loop, os.getpid()
+
+    def gather(self, *statements):
+        # the rows of each statement, in order, fetched concurrently
+        self._start()
+        future = asyncio.run_coroutine_threadsafe(self._gather(statements), self._loop)
+        return future.result(self.app.config['ASYNC_READS_TIMEOUT'])
+
+    async def _gather(self, statements):
+        return await asyncio.gather(*[self._fetch(statement) for statement in statements])
+
+    async def _fetch(self, statement):
+        async with self._engine.connect() as conn:
+            result = await conn.execute(statement)
+            return result.all()
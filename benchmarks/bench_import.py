@@ -0,0 +1,136 @@
+import json
+import re
+from datetime import timedelta
+
+import pytest
+
+import seed as synthetic
+from app import Artist, Shows, Venue, db, name_indexes
+
+# ----------------------------------------------------------------------------#
+# Export / import round trip.
+# ----------------------------------------------------------------------------#
+
+# Not timings: what `flask export` writes, `flask import` must load back
+# unchanged, and bad rows must be rejected rather than guessed at or fatal.
+
+SUMMARY = re.compile(r'Loaded (\d+) row\(s\), rejected (\d+)')
+
+
+@pytest.fixture
+def cli(app):
+    # the rows imported by a test are removed again afterwards
+    with app.app_context():
+        ids = [db.session.query(db.func.max(model.id)).scalar() or 0 for model in (Venue, Artist, Shows)]
+    yield app.test_cli_runner()
+    with app.app_context():
+        synthetic.trim(*ids)
+    name_indexes.clear()
+
+
+def run(cli, *args):
+    result = cli.invoke(args=list(args))
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def load(cli, *args):
+    # (loaded, rejected) from the `flask import` summary
+    loaded, rejected = SUMMARY.search(run(cli, 'import', *args)).groups()
+    return int(loaded), int(rejected)
+
+
+def entity_rows(model, flag, ids):
+    rows = db.session.query(model).filter(model.id.in_(ids)).order_by(model.id)
+    return [(row.name, row.city, row.phone, getattr(row, flag), sorted(genre.name for genre in row.genres))
+            for row in rows]
+
+
+@pytest.mark.parametrize('kind,model,flag', [
+    ('venues', Venue, 'seeking_talent'),
+    ('artists', Artist, 'seeking_venues'),
+])
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def bench_entity_round_trip(app, cli, tmp_path, kind, model, flag, fmt):
+    path = str(tmp_path / ('%s.%s' % (kind, fmt)))
+    with app.app_context():
+        last = db.session.query(db.func.max(model.id)).scalar()
+        exported = entity_rows(model, flag, range(1, last + 1))
+    run(cli, 'export', kind, '--format', fmt, '-o', path)
+    assert load(cli, kind, path) == (len(exported), 0)
+    with app.app_context():
+        imported = entity_rows(model, flag, range(last + 1, 2 * last + 1))
+    # the seeded rows include both seeking and not seeking
+    assert set(row[3] for row in exported) == {False, True}
+    assert imported == exported
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def bench_show_round_trip(app, cli, tmp_path, fmt):
+    path = str(tmp_path / ('shows.%s' % fmt))
+    with app.app_context():
+        last = db.session.query(db.func.max(Shows.id)).scalar()
+        exported = db.session.query(Shows.artist_id, Shows.venue_id, Shows.start_time).order_by(Shows.id).all()
+    run(cli, 'export', 'shows', '--format', fmt, '-o', path)
+    assert load(cli, 'shows', path) == (len(exported), 0)
+    with app.app_context():
+        imported = db.session.query(Shows.artist_id, Shows.venue_id, Shows.start_time).filter(
+            Shows.id > last).order_by(Shows.id).all()
+    assert imported == exported
+
+
+def bench_bad_rows_are_rejected(app, cli, tmp_path):
+    csv_path = tmp_path / 'shows.csv'
+    csv_path.write_text('artist_id,venue_id,start_time\n'
+                        '1,1,\n'                      # no start time
+                        '1,1,not a date\n'
+                        '1,1,2030-01-02T20:00:00\n')  # ISO 8601 with a T
+    ndjson_path = tmp_path / 'shows.ndjson'
+    ndjson_path.write_text('{"artist_id": 1, "venue_id": 1, "start_time": "2030-01-01T20:00:00Z"}\n'
+                           '{"artist_id": 1, "venue_id": \n'
+                           '[1, 2]\n'
+                           '{"artist_id": 1, "venue_id": 1}\n'
+                           '{"artist_id": 1, "venue_id": 1, "start_time": "2030-01-03 20:00:00"}\n')
+    rejects = tmp_path / 'rejects.ndjson'
+    assert load(cli, 'shows', str(csv_path)) == (1, 2)
+    assert load(cli, 'shows', str(ndjson_path), '--rejects', str(rejects)) == (2, 3)
+    assert [json.loads(line)['line'] for line in rejects.read_text().splitlines()] == [2, 3, 4]
+
+    venue_path = tmp_path / 'venues.csv'
+    venue_path.write_text('name,city,state,address,phone,genres,facebook_link,seeking_talent\n'
+                          'The False Hall,Austin,TX,1 Main St,555-555-0000,Jazz,https://www.facebook.com/a,False\n'
+                          'The Zero Hall,Austin,TX,1 Main St,555-555-0000,Jazz,https://www.facebook.com/b,0\n'
+                          'The Yes Hall,Austin,TX,1 Main St,555-555-0000,Jazz,https://www.facebook.com/c,True\n')
+    assert load(cli, 'venues', str(venue_path)) == (3, 0)
+    with app.app_context():
+        seeking = dict(db.session.query(Venue.name, Venue.seeking_talent).filter(
+            Venue.name.in_(['The False Hall', 'The Zero Hall', 'The Yes Hall'])))
+    assert seeking == {'The False Hall': False, 'The Zero Hall': False, 'The Yes Hall': True}
+
+
+def bench_export_since(app, cli, client, tmp_path):
+    # only rows written after ?since= / --since are exported; a trailing Z
+    # (UTC) is accepted
+    with app.app_context():
+        since = db.session.query(db.func.max(Shows.updated_at)).scalar()
+        touched = db.session.query(Shows).filter(Shows.id.in_([1, 2])).all()
+        stamps = dict((show.id, show.updated_at) for show in touched)
+        for show in touched:
+            show.updated_at = since + timedelta(seconds=1)
+        db.session.commit()
+    try:
+        response = client.get('/api/v1/export/shows?format=ndjson&since=%sZ' % since.isoformat())
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()] == [1, 2]
+
+        path = str(tmp_path / 'shows.ndjson')
+        run(cli, 'export', 'shows', '--format', 'ndjson', '--since', since.isoformat() + '+00:00', '-o', path)
+        with open(path) as f:
+            assert [json.loads(line)['id'] for line in f] == [1, 2]
+
+        assert client.get('/api/v1/export/shows?since=yesterday').status_code == 400
+    finally:
+        with app.app_context():
+            for show in db.session.query(Shows).filter(Shows.id.in_(stamps)):
+                show.updated_at = stamps[show.id]
+            db.session.commit()
@@ -0,0 +1,94 @@
+import os
+import re
+
+import pytest
+
+import seed as synthetic
+from app import Artist, Shows, Venue, db, name_indexes, sql_profiler
+
+# ----------------------------------------------------------------------------#
+# Query counts and plans.
+# ----------------------------------------------------------------------------#
+
+# Not timings: these check that a page runs the same number of queries however
+# much data there is, and that no query reads the whole shows or venue table.
+
+PAGES = [
+    '/venues',
+    '/venues/1',
+    '/artists',
+    '/artists/1',
+    '/shows',
+    '/api/v1/venues',
+    '/api/v1/venues/1',
+    '/api/v1/artists/1',
+    '/api/v1/shows',
+]
+
+GROWTH = {
+    'venues': int(os.environ.get('BENCH_GROWTH_VENUES', 200)),
+    'artists': int(os.environ.get('BENCH_GROWTH_ARTISTS', 200)),
+    'shows': int(os.environ.get('BENCH_GROWTH_SHOWS', 20000)),
+}
+
+# PostgreSQL only picks index scans once a table is big enough to make them pay
+EXPLAIN_MIN_SHOWS = int(os.environ.get('BENCH_EXPLAIN_MIN_SHOWS', 100000))
+
+# a PostgreSQL sequential scan, or an SQLite scan that uses no index
+TABLE_SCAN = re.compile(r'Seq Scan on (shows|venue)\b|\bSCAN (TABLE )?(shows|venue)\s*$')
+
+
+def query_counts(client, statements):
+    counts = {}
+    for url in PAGES:
+        statements[:] = []
+        response = client.get(url)
+        assert response.status_code == 200, url
+        response.get_data()
+        counts[url] = len(statements)
+    return counts
+
+
+def max_ids(*models):
+    return [db.session.query(db.func.max(model.id)).scalar() or 0 for model in models]
+
+
+def bench_query_counts_are_constant(app, client, statements):
+    before = query_counts(client, statements)
+    with app.app_context():
+        venues, artists, shows = max_ids(Venue, Artist, Shows)
+        synthetic.seed(rng_seed=1, **GROWTH)
+    name_indexes.clear()
+    try:
+        after = query_counts(client, statements)
+    finally:
+        with app.app_context():
+            synthetic.trim(venues, artists, shows)
+        name_indexes.clear()
+    assert after == before
+
+
+def scans_table(plan):
+    return any(TABLE_SCAN.search(line) for line in plan)
+
+
+def whole_table_aggregate(statement):
+    # the listing pages' version stamps (count and max(updated_at) over the
+    # whole table) have nothing to narrow them down; they are one pass per
+    # conditional GET, paid for by the 304s they allow
+    return ' WHERE ' not in statement and 'count(' in statement
+
+
+@pytest.mark.parametrize('url', PAGES + ['/api/v1/search/venues?q=hop'])
+def bench_queries_use_indexes(app, client, statements, url):
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'postgresql' and Shows.query.count() < EXPLAIN_MIN_SHOWS:
+            pytest.skip('fewer than %d shows; seed more to make the plans meaningful' % EXPLAIN_MIN_SHOWS)
+    statements[:] = []
+    client.get(url).get_data()
+    for statement, parameters in list(statements):
+        if whole_table_aggregate(statement):
+            continue
+        plan = sql_profiler.explain(engine, statement, parameters)
+        assert not (plan and scans_table(plan)), '%s\n%s' % (statement, '\n'.join(plan))
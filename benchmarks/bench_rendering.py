@@ -0,0 +1,106 @@
+import time
+import tracemalloc
+from datetime import timedelta
+
+import pytest
+from flask import render_template
+
+from app import Shows, db, export_rows, formatted_datetime, show_item, show_time_now, shows_feed
+from exporter import write_parquet
+
+# ----------------------------------------------------------------------------#
+# Rendering, compression, streaming and export.
+# ----------------------------------------------------------------------------#
+
+RENDER_SHOWS = 10000
+
+COMPRESSED_ROUTES = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1', '/api/v1/shows']
+
+
+@pytest.fixture(scope='module')
+def show_rows():
+    now = show_time_now()
+    return [{'venue_id': i, 'venue_name': 'The Velvet Hall %d' % i, 'artist_id': i,
+             'artist_name': 'The Neon Quartet %d' % i, 'artist_image_link': '',
+             'start_time': now + timedelta(minutes=17 * i)} for i in range(RENDER_SHOWS)]
+
+
+@pytest.mark.parametrize('start_time', ['datetime', 'string'])
+def bench_render_show_times(benchmark, app, show_rows, start_time):
+    # 10k show times through the datetime filter; strings are what the views
+    # passed before they handed over the datetimes themselves
+    if start_time == 'string':
+        show_rows = [dict(row, start_time=str(row['start_time'])) for row in show_rows]
+
+    def render():
+        with app.test_request_context('/shows'):
+            return render_template('pages/shows.html', shows=show_rows, page=None)
+
+    benchmark.pedantic(render, setup=formatted_datetime.cache_clear, rounds=5)
+
+
+@pytest.mark.parametrize('url', COMPRESSED_ROUTES)
+@pytest.mark.parametrize('encoding', ['identity', 'gzip'])
+def bench_compression(benchmark, client, url, encoding):
+    headers = {'Accept-Encoding': encoding}
+    body = client.get(url, headers=headers).get_data()
+    benchmark.extra_info['bytes'] = len(body)
+    benchmark.extra_info['identity_bytes'] = len(client.get(url).get_data())
+    benchmark(lambda: client.get(url, headers=headers).get_data())
+
+
+def first_chunk_and_peak(produce):
+    # (seconds to the first chunk, seconds to the last, peak bytes allocated)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        chunks = iter(produce())
+        next(chunks, None)
+        first = time.perf_counter() - start
+        for _ in chunks:
+            pass
+        total = time.perf_counter() - start
+        return first, total, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def buffered_shows(app):
+    with app.test_request_context('/shows'):
+        rows = shows_feed().order_by(Shows.start_time, Shows.id)
+        return [render_template('pages/shows.html', shows=[show_item(row) for row in rows], page=None)]
+
+
+@pytest.mark.parametrize('mode', ['streamed', 'buffered'])
+def bench_shows_time_to_first_byte(benchmark, app, client, mode):
+    # the whole shows feed as one page
+    if mode == 'streamed':
+        def produce():
+            return client.get('/shows?stream=1', buffered=False).response
+    else:
+        def produce():
+            return buffered_shows(app)
+
+    first, total, peak = first_chunk_and_peak(produce)
+    benchmark.extra_info.update(ttfb_ms=first * 1000, total_ms=total * 1000, peak_bytes=peak)
+    benchmark.pedantic(lambda: list(produce()), rounds=5)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def bench_export_stream(benchmark, client, fmt):
+    url = '/api/v1/export/shows?format=%s' % fmt
+    benchmark.extra_info['bytes'] = len(client.get(url).get_data())
+    benchmark.pedantic(lambda: client.get(url).get_data(), rounds=5)
+
+
+def bench_export_parquet(benchmark, app, tmp_path):
+    pytest.importorskip('pyarrow')
+
+    def export():
+        with app.app_context():
+            columns, rows = export_rows('shows')
+            write_parquet(str(tmp_path / 'shows.parquet'), columns, rows)
+            db.session.remove()
+
+    benchmark.pedantic(export, rounds=3)
+    benchmark.extra_info['bytes'] = (tmp_path / 'shows.parquet').stat().st_size
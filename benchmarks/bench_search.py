@@ -0,0 +1,94 @@
+import os
+import random
+
+import pytest
+
+import seed as synthetic
+from app import db
+from search import TrigramIndex, escape_like, similarity
+
+# ----------------------------------------------------------------------------#
+# Name search.
+# ----------------------------------------------------------------------------#
+
+# The in-process TrigramIndex (the search used on SQLite) against the linear
+# scan it replaced, over BENCH_SEARCH_ROWS names; and, when BENCH_DATABASE_URL
+# is PostgreSQL, the search's ILIKE query over as many rows with and without
+# the gin_trgm_ops index.
+
+ROWS = int(os.environ.get('BENCH_SEARCH_ROWS', 100000))
+TERMS = ['hop', 'Velvet', 'neon hall', 'zz']
+
+
+@pytest.fixture(scope='module')
+def names():
+    rng = random.Random(0)
+    return [(id, synthetic.name(rng, id)) for id in range(1, ROWS + 1)]
+
+
+@pytest.fixture(scope='module')
+def index(names):
+    return TrigramIndex(names)
+
+
+def linear_search(names, term):
+    term = term.lower()
+    matches = [(id, name.lower()) for id, name in names if term in name.lower()]
+    matches.sort(key=lambda match: (-similarity(term, match[1]), match[1], match[0]))
+    return [id for id, name in matches]
+
+
+def bench_build_index(benchmark, names):
+    benchmark.pedantic(TrigramIndex, args=(names,), rounds=3)
+
+
+@pytest.mark.parametrize('term', TERMS)
+def bench_trigram_index(benchmark, index, names, term):
+    ids = benchmark(index.search, term)
+    benchmark.extra_info['matches'] = len(ids)
+    assert ids == linear_search(names, term)
+
+
+@pytest.mark.parametrize('term', TERMS)
+def bench_linear_scan(benchmark, names, term):
+    ids = benchmark.pedantic(linear_search, args=(names, term), rounds=5)
+    benchmark.extra_info['matches'] = len(ids)
+
+
+@pytest.fixture(scope='module')
+def pg_connection(app, names):
+    # a temporary copy of `names`, which only this connection can see
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        pytest.skip('needs BENCH_DATABASE_URL to point at PostgreSQL')
+    with engine.connect() as connection:
+        connection.execute(db.text('CREATE TEMPORARY TABLE bench_names (id integer PRIMARY KEY, name varchar NOT NULL)'))
+        connection.execute(db.text('INSERT INTO bench_names (id, name) VALUES (:id, :name)'),
+                           [{'id': id, 'name': name} for id, name in names])
+        connection.execute(db.text('ANALYZE bench_names'))
+        yield connection
+        connection.execute(db.text('DROP TABLE bench_names'))
+
+
+ILIKE_SEARCH = db.text(
+    "SELECT id FROM bench_names WHERE name ILIKE :pattern ESCAPE '\\' "
+    "ORDER BY similarity(name, :term) DESC, name, id")
+
+
+@pytest.mark.parametrize('indexed', [False, True], ids=['seq_scan', 'gin_index'])
+@pytest.mark.parametrize('term', TERMS)
+def bench_postgresql_ilike(benchmark, pg_connection, names, term, indexed):
+    if indexed:
+        pg_connection.execute(db.text('CREATE INDEX bench_names_trgm ON bench_names USING gin (name gin_trgm_ops)'))
+        pg_connection.execute(db.text('ANALYZE bench_names'))
+    try:
+        params = {'pattern': '%' + escape_like(term) + '%', 'term': term}
+        plan = '\n'.join(row[0] for row in pg_connection.execute(db.text('EXPLAIN ' + ILIKE_SEARCH.text), params))
+        benchmark.extra_info['uses_index'] = 'bench_names_trgm' in plan
+        ids = benchmark(lambda: [row[0] for row in pg_connection.execute(ILIKE_SEARCH, params)])
+        benchmark.extra_info['matches'] = len(ids)
+        assert sorted(ids) == sorted(linear_search(names, term))
+    finally:
+        if indexed:
+            pg_connection.execute(db.text('DROP INDEX bench_names_trgm'))
@@ -0,0 +1,138 @@
+import itertools
+
+import pytest
+
+from app import Artist, Venue, db
+
+# ----------------------------------------------------------------------------#
+# One benchmark per view.
+# ----------------------------------------------------------------------------#
+
+# Each benchmark also records the number of SQL statements a request runs in
+# extra_info['queries'], so the JSON results show query-count regressions as
+# well as timing ones.
+
+GET_ROUTES = [
+    '/',
+    '/venues',
+    '/venues?stream=1',
+    '/venues/1',
+    '/venues/1/edit',
+    '/venues/create',
+    '/artists',
+    '/artists?stream=1',
+    '/artists/1',
+    '/artists/1/edit',
+    '/artists/create',
+    '/shows',
+    '/shows?stream=1',
+    '/shows/create',
+    '/genres/Jazz',
+    '/_stats/cache',
+    '/_stats/pool',
+    '/api/v1/venues',
+    '/api/v1/venues/1',
+    '/api/v1/artists',
+    '/api/v1/artists/1',
+    '/api/v1/shows',
+    '/api/v1/search/venues?q=hop',
+    '/api/v1/search/artists?q=hop',
+    '/api/v1/export/shows?format=csv',
+]
+
+SEARCHES = [
+    ('/venues/search', 'hop'),
+    ('/venues/search', 'The'),
+    ('/artists/search', 'hop'),
+    ('/artists/search', 'The'),
+]
+
+numbers = itertools.count(1)
+
+
+def venue_form(**fields):
+    form = {'name': 'The Bench Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Bench St',
+            'phone': '555-555-0000', 'genres': ['Jazz', 'Blues'], 'image_link': '',
+            'facebook_link': 'https://www.facebook.com/bench', 'website_link': '', 'seeking_talent': 'True',
+            'seeking_description': 'Null'}
+    form.update(fields)
+    return form
+
+
+def artist_form(**fields):
+    form = {'name': 'The Bench Quartet', 'city': 'Austin', 'state': 'TX', 'phone': '555-555-0000',
+            'genres': ['Jazz'], 'image_link': '', 'facebook_link': 'https://www.facebook.com/bench', 'website_link': '',
+            'seeking_venue': 'True', 'seeking_description': 'Null'}
+    form.update(fields)
+    return form
+
+
+def run(benchmark, statements, request):
+    # warm up (and count the queries of) one request before timing it
+    statements[:] = []
+    response = request()
+    benchmark.extra_info['queries'] = len(statements)
+    benchmark.extra_info['bytes'] = len(response.get_data())
+    assert response.status_code < 400, response.status_code
+    benchmark(lambda: request().get_data())
+
+
+@pytest.mark.parametrize('url', GET_ROUTES)
+def bench_get(benchmark, client, statements, url):
+    run(benchmark, statements, lambda: client.get(url))
+
+
+@pytest.mark.parametrize('url,term', SEARCHES)
+def bench_search(benchmark, client, statements, url, term):
+    run(benchmark, statements, lambda: client.post(url, data={'search_term': term}))
+
+
+def bench_create_venue(benchmark, client, statements):
+    run(benchmark, statements, lambda: client.post(
+        '/venues/create', data=venue_form(name='The Bench Hall %d' % next(numbers))))
+
+
+def bench_create_artist(benchmark, client, statements):
+    run(benchmark, statements, lambda: client.post(
+        '/artists/create', data=artist_form(name='The Bench Quartet %d' % next(numbers))))
+
+
+def bench_create_show(benchmark, client, statements):
+    run(benchmark, statements, lambda: client.post(
+        '/shows/create', data={'artist_id': '1', 'venue_id': '1', 'start_time': '2030-01-01 20:00:00'}))
+
+
+def bench_edit_venue(benchmark, app, client, statements):
+    # the view redirects whether or not the edit was saved, so check the row
+    name = 'The Edited Hall %d' % next(numbers)
+    run(benchmark, statements, lambda: client.post('/venues/2/edit', data=venue_form(name=name)))
+    with app.app_context():
+        assert Venue.query.get(2).name == name
+
+
+def bench_edit_artist(benchmark, app, client, statements):
+    name = 'The Edited Quartet %d' % next(numbers)
+    run(benchmark, statements, lambda: client.post('/artists/2/edit', data=artist_form(name=name)))
+    with app.app_context():
+        assert Artist.query.get(2).name == name
+
+
+def bench_delete_venue(benchmark, app, client, statements):
+    # each round deletes a venue created (untimed) by its setup
+    def setup():
+        with app.app_context():
+            venue = Venue(name='The Doomed Hall %d' % next(numbers), city='Austin', state='TX', address='x')
+            db.session.add(venue)
+            db.session.commit()
+            return (venue.id,), {}
+
+    def delete(venue_id):
+        response = client.delete('/venues/%d' % venue_id)
+        assert response.status_code == 200
+        return response
+
+    venue_id = setup()[0][0]
+    statements[:] = []
+    delete(venue_id)
+    benchmark.extra_info['queries'] = len(statements)
+    benchmark.pedantic(delete, setup=setup, rounds=50)
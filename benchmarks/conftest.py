@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as fyyur_app, db, name_indexes, page_cache  # noqa: E402
+import seed as synthetic  # noqa: E402
+
+# ----------------------------------------------------------------------------#
+# Benchmark fixtures.
+# ----------------------------------------------------------------------------#
+
+# The suite runs against BENCH_DATABASE_URL (a throwaway SQLite file by
+# default), which is dropped, recreated and seeded with BENCH_VENUES,
+# BENCH_ARTISTS and BENCH_SHOWS rows once per session.
+
+SIZES = {
+    'venues': int(os.environ.get('BENCH_VENUES', 200)),
+    'artists': int(os.environ.get('BENCH_ARTISTS', 200)),
+    'shows': int(os.environ.get('BENCH_SHOWS', 5000)),
+}
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    url = os.environ.get('BENCH_DATABASE_URL') or 'sqlite:///%s' % (tmp_path_factory.mktemp('bench') / 'bench.db')
+    if url == os.environ.get('DATABASE_URL'):
+        pytest.exit('BENCH_DATABASE_URL is dropped and reseeded; point it at a database of its own')
+    fyyur_app.config.update(
+        SQLALCHEMY_DATABASE_URI=url,
+        SQLALCHEMY_BINDS={},
+        WTF_CSRF_ENABLED=False,
+        # measure the views, not the page cache
+        PAGE_CACHE_ENABLED=False,
+    )
+    page_cache.enabled = False
+    with fyyur_app.app_context():
+        db.drop_all()
+        db.create_all()
+        synthetic.seed(**SIZES)
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+    name_indexes.clear()
+    return fyyur_app
+
+
+@pytest.fixture
+def client(app):
+    # a fresh client per benchmark, so no flashed messages or cookies carry over
+    return app.test_client()
+
+
+@pytest.fixture
+def statements(app):
+    # (statement, parameters) of every SQL statement run during the test
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
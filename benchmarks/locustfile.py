@@ -0,0 +1,58 @@
+import random
+
+from locust import HttpUser, between, task
+
+# ----------------------------------------------------------------------------#
+# Load scenario.
+# ----------------------------------------------------------------------------#
+
+# A mixed read-heavy visitor against a running server seeded with
+# benchmarks/seed.py, e.g.
+#
+#   locust -f benchmarks/locustfile.py --host http://localhost:5000 \
+#       --headless -u 100 -r 10 -t 2m --csv results/load
+#
+# Run it once against a server started with ASYNC_READS=0 and once with
+# ASYNC_READS=1 to compare the two read paths under concurrency.
+# VENUES/ARTISTS must not exceed the seeded counts.
+
+VENUES = 1000
+ARTISTS = 1000
+TERMS = ['hop', 'The', 'Velvet', 'neon hall', 'club']
+
+
+class Visitor(HttpUser):
+    wait_time = between(0.5, 2)
+
+    @task(6)
+    def listings(self):
+        self.client.get(random.choice(['/venues', '/artists', '/shows']))
+
+    @task(8)
+    def venue(self):
+        self.client.get('/venues/%d' % random.randint(1, VENUES), name='/venues/[id]')
+
+    @task(8)
+    def artist(self):
+        self.client.get('/artists/%d' % random.randint(1, ARTISTS), name='/artists/[id]')
+
+    @task(3)
+    def search(self):
+        path = random.choice(['/venues/search', '/artists/search'])
+        self.client.post(path, data={'search_term': random.choice(TERMS)})
+
+    @task(4)
+    def api(self):
+        self.client.get(random.choice([
+            '/api/v1/venues', '/api/v1/artists', '/api/v1/shows',
+            '/api/v1/venues/%d' % random.randint(1, VENUES),
+            '/api/v1/search/artists?q=%s' % random.choice(TERMS),
+        ]), name='/api/v1')
+
+    @task(1)
+    def create_show(self):
+        self.client.post('/shows/create', data={
+            'artist_id': random.randint(1, ARTISTS),
+            'venue_id': random.randint(1, VENUES),
+            'start_time': '2030-%02d-%02d 20:00:00' % (random.randint(1, 12), random.randint(1, 28)),
+        })
@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (app, db, Artist, Genre, Shows, Venue, artist_genres, rebuild_show_counters,  # noqa: E402
+                 show_time_now, venue_genres)
+from importer import chunked  # noqa: E402
+
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+# Deterministic (for a given --seed) venues, artists and shows, written with
+# bulk INSERTs so a million shows load in well under a minute. Shows are
+# spread a year either side of now, so both past and upcoming lists fill up.
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+          'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+ADJECTIVES = ['Musical', 'Wild', 'Electric', 'Blue', 'Golden', 'Velvet', 'Silent', 'Lucky',
+              'Crimson', 'Midnight', 'Rusty', 'Neon', 'Hollow', 'Brass', 'Paper', 'Iron']
+NOUNS = ['Hop', 'Sax Band', 'Lounge', 'Garage', 'Petals', 'Coffee', 'Hall', 'Collective',
+         'Quartet', 'Cellar', 'Room', 'Parade', 'Orchestra', 'Barn', 'Harbor', 'Club']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('Denver', 'CO'), ('Boston', 'MA')]
+
+
+def name(rng, number):
+    return 'The %s %s %d' % (rng.choice(ADJECTIVES), rng.choice(NOUNS), number)
+
+
+def genre_ids():
+    existing = dict((genre.name, genre.id) for genre in Genre.query)
+    missing = [{'name': name} for name in GENRES if name not in existing]
+    if missing:
+        db.session.execute(Genre.__table__.insert(), missing)
+        existing = dict((genre.name, genre.id) for genre in Genre.query)
+    return [existing[name] for name in GENRES]
+
+
+def insert(table, rows, batch_size):
+    for chunk in chunked(rows, batch_size):
+        db.session.execute(table.insert(), chunk)
+
+
+def max_id(model):
+    return db.session.query(db.func.max(model.id)).scalar() or 0
+
+
+def seed(venues=100, artists=100, shows=1000, rng_seed=0, batch_size=10000):
+    # appends to whatever is in the database; returns the new row counts
+    rng = random.Random(rng_seed)
+    now = show_time_now()
+    genres = genre_ids()
+    last_venue, last_artist = max_id(Venue), max_id(Artist)
+
+    def venue(number):
+        city, state = rng.choice(CITIES)
+        return {'name': name(rng, number), 'city': city, 'state': state,
+                'address': '%d Main St' % number, 'phone': '555-555-%04d' % (number % 10000),
+                'image_link': 'https://example.com/venue/%d.jpg' % number,
+                'facebook_link': 'https://www.facebook.com/venue%d' % number,
+                'website_link': 'https://example.com/venue/%d' % number,
+                'seeking_talent': rng.random() < 0.5, 'seeking_description': 'Null',
+                'updated_at': now}
+
+    def artist(number):
+        city, state = rng.choice(CITIES)
+        return {'name': name(rng, number), 'city': city, 'state': state,
+                'phone': '555-555-%04d' % (number % 10000),
+                'image_link': 'https://example.com/artist/%d.jpg' % number,
+                'facebook_link': 'https://www.facebook.com/artist%d' % number,
+                'website_link': 'https://example.com/artist/%d' % number,
+                'seeking_venues': rng.random() < 0.5, 'seeking_description': 'Null',
+                'updated_at': now}
+
+    # ids are left to the database so its sequences stay in step
+    insert(Venue.__table__, (venue(last_venue + number) for number in range(1, venues + 1)), batch_size)
+    insert(Artist.__table__, (artist(last_artist + number) for number in range(1, artists + 1)), batch_size)
+    venue_ids = [id for (id,) in db.session.query(Venue.id).filter(Venue.id > last_venue).order_by(Venue.id)]
+    artist_ids = [id for (id,) in db.session.query(Artist.id).filter(Artist.id > last_artist).order_by(Artist.id)]
+    insert(venue_genres, ({'venue_id': number, 'genre_id': genre}
+                          for number in venue_ids for genre in rng.sample(genres, 2)), batch_size)
+    insert(artist_genres, ({'artist_id': number, 'genre_id': genre}
+                           for number in artist_ids for genre in rng.sample(genres, 2)), batch_size)
+    if venues and artists:
+        insert(Shows.__table__, ({'venue_id': rng.choice(venue_ids), 'artist_id': rng.choice(artist_ids),
+                                  'start_time': now + timedelta(minutes=rng.randint(-525600, 525600)),
+                                  'updated_at': now}
+                                 for _ in range(shows)), batch_size)
+    rebuild_show_counters(now)
+    return {'venues': venues, 'artists': artists, 'shows': shows if venues and artists else 0}
+
+
+def trim(venues, artists, shows):
+    # delete the rows added after the given max ids, e.g. after seed()
+    db.session.query(Shows).filter(
+        (Shows.id > shows) | (Shows.venue_id > venues) | (Shows.artist_id > artists)
+    ).delete(synchronize_session=False)
+    db.session.execute(venue_genres.delete().where(venue_genres.c.venue_id > venues))
+    db.session.execute(artist_genres.delete().where(artist_genres.c.artist_id > artists))
+    db.session.query(Venue).filter(Venue.id > venues).delete(synchronize_session=False)
+    db.session.query(Artist).filter(Artist.id > artists).delete(synchronize_session=False)
+    rebuild_show_counters(show_time_now())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed the database with synthetic Fyyur data.')
+    parser.add_argument('--database-url', help='defaults to the app\'s DATABASE_URL')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table first')
+    args = parser.parse_args(argv)
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        counts = seed(args.venues, args.artists, args.shows, args.seed)
+    print('Seeded %(venues)d venue(s), %(artists)d artist(s) and %(shows)d show(s).' % counts)
+
+
+if __name__ == '__main__':
+    main()
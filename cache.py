@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, session
+
+# ----------------------------------------------------------------------------#
+# Page cache.
+# ----------------------------------------------------------------------------#
+
+# Rendered pages are cached under per-entity keys such as 'venue:1'. A hit is
+# returned before the view runs, so it costs neither database queries nor
+# template rendering. Writes invalidate the keys they affect; the TTL bounds
+# how stale a page can get otherwise (e.g. a show moving from upcoming to
+# past) and, with the in-process backend, how long other worker processes
+# can serve a page that was invalidated elsewhere.
+#
+# With read replicas, pages and stamps are only ever filled from the primary:
+# a lagging replica would otherwise put pre-write data back in the cache for
+# a whole TTL. Clients pinned to the primary after a write skip the cache.
+
+
+class LRUCache(object):
+    # in-process backend: least recently used entries are evicted past
+    # `maxsize`, and every entry expires `ttl` seconds after it was set
+
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= self._timer():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(object):
+    # shared backend so every worker process sees the same pages and
+    # invalidations; needs the optional `redis` package
+
+    def __init__(self, url, ttl=60, prefix='fyyur:page:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('PAGE_CACHE_REDIS_URL is set but the redis package is not installed')
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(self.prefix + '*'))
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else value.decode('utf-8')
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+class PageCache(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_SIZE', 1024)
+        app.config.setdefault('PAGE_CACHE_TTL', 60)
+        app.config.setdefault('PAGE_CACHE_REDIS_URL', None)
+        app.config.setdefault('PAGE_CACHE_BACKEND', None)
+
+        self.enabled = app.config['PAGE_CACHE_ENABLED']
+        if app.config['PAGE_CACHE_BACKEND'] is not None:
+            # any object with get/set/delete/clear, e.g. for tests
+            self.backend = app.config['PAGE_CACHE_BACKEND']
+        elif app.config['PAGE_CACHE_REDIS_URL']:
+            self.backend = RedisCache(app.config['PAGE_CACHE_REDIS_URL'], ttl=app.config['PAGE_CACHE_TTL'])
+        else:
+            self.backend = LRUCache(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+        app.extensions['page_cache'] = self
+
+    def cached(self, key):
+        # cache the string a view returns under `key`, formatted with the
+        # view's URL arguments, e.g. @page_cache.cached('venue:{venue_id}')
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # pages rendered with pending flash messages are personal
+                if not self.enabled or session.get('_flashes') or self._pinned():
+                    return view(**kwargs)
+                cache_key = key.format(**kwargs)
+                page = self.backend.get(cache_key)
+                with self._lock:
+                    if page is None:
+                        self.misses += 1
+                    else:
+                        self.hits += 1
+                # per-endpoint hit ratios for the request metrics
+                g._page_cache = 'miss' if page is None else 'hit'
+                if page is not None:
+                    return page
+                self._use_primary()
+                rv = view(**kwargs)
+                if isinstance(rv, str):
+                    self.backend.set(cache_key, rv)
+                return rv
+            return wrapper
+        return decorator
+
+    def stamp(self, key, compute):
+        # the conditional-GET version stamp of the page cached under `key`,
+        # cached next to it and invalidated with it, so a cache hit costs no
+        # query at all. Stored as text for the Redis backend: the last
+        # modified time and the repr of the rest, which is all an ETag needs
+        if not self.enabled or self.backend is None or self._pinned():
+            return compute()
+        stored = self.backend.get('stamp:' + key)
+        if stored is None:
+            self._use_primary()
+            version = compute()
+            last_modified = version[0].isoformat() if version[0] is not None else None
+            stored = json.dumps([last_modified, repr(version[1:])])
+            self.backend.set('stamp:' + key, stored)
+        last_modified, rest = json.loads(stored)
+        return (datetime.fromisoformat(last_modified) if last_modified else None, rest)
+
+    def _pinned(self):
+        router = current_app.extensions.get('replica_router')
+        return router is not None and router.pinned()
+
+    def _use_primary(self):
+        router = current_app.extensions.get('replica_router')
+        if router is not None:
+            router.use_primary()
+
+    def invalidate(self, *keys):
+        if self.backend is not None:
+            self.backend.delete(*(list(keys) + ['stamp:' + key for key in keys]))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "size": len(self.backend) if self.backend is not None else 0
+        }
@@ -0,0 +1,172 @@
+import zlib
+from itertools import chain
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ----------------------------------------------------------------------------#
+# Response compression.
+# ----------------------------------------------------------------------------#
+
+# CompressionMiddleware wraps the WSGI app and compresses HTML, JSON, CSV,
+# CSS and JS responses chunk by chunk as the app produces them. Streamed
+# pages stay streamed and large bodies are never held twice in memory.
+# Bodies shorter than `min_size` bytes are sent as they are.
+
+COMPRESSIBLE_TYPES = frozenset([
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'image/svg+xml',
+])
+
+
+def choose_encoding(accept_encoding):
+    # brotli when the client accepts it and the optional package is installed
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+class GzipStream(object):
+
+    def __init__(self, level):
+        # wbits=31: deflate with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream(object):
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+STREAMS = {'gzip': GzipStream, 'br': BrotliStream}
+
+
+class CompressionMiddleware(object):
+
+    def __init__(self, app, min_size=500, level=6, flush_size=8192, mimetypes=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        # streamed bodies are flushed to the client every `flush_size` input
+        # bytes, so a streamed page still arrives progressively
+        self.flush_size = flush_size
+        self.mimetypes = mimetypes
+
+    def __call__(self, environ, start_response):
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return self._write
+
+        app_iter = self.app(environ, capture)
+        # the app's iterable is closed when the server closes ours, never by
+        # a generator finalizer that the garbage collector may run in the
+        # middle of unrelated code
+        return ClosingIterator(self._respond(environ, start_response, captured, app_iter),
+                               getattr(app_iter, 'close', None))
+
+    @staticmethod
+    def _write(data):
+        raise NotImplementedError('CompressionMiddleware does not support the WSGI write() callable')
+
+    def _compressible(self, environ, status, headers):
+        code = int(status.split(None, 1)[0])
+        if environ['REQUEST_METHOD'] == 'HEAD' or code < 200 or code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return headers.get('Content-Type', '').split(';', 1)[0].strip().lower() in self.mimetypes
+
+    def _respond(self, environ, start_response, captured, app_iter):
+        chunks = iter(app_iter)
+        # apps may call start_response as late as their first chunk
+        pending = []
+        while not captured:
+            pending.append(next(chunks))
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+
+        if not self._compressible(environ, status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            for chunk in chain(pending, chunks):
+                yield chunk
+            return
+
+        add_vary(headers)
+        encoding = choose_encoding(parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING')))
+        length = headers.get('Content-Length', type=int)
+        if length is None:
+            # unknown length: read ahead until the threshold is reached
+            size = sum(len(chunk) for chunk in pending)
+            while size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(chunk)
+                size += len(chunk)
+            short = size < self.min_size
+        else:
+            short = length < self.min_size
+
+        if encoding is None or short:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            for chunk in chain(pending, chunks):
+                yield chunk
+            return
+
+        stream = STREAMS[encoding](self.level)
+        headers.remove('Content-Length')
+        headers['Content-Encoding'] = encoding
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # the compressed bytes differ, but the entity is the same
+            headers['ETag'] = 'W/' + etag
+        start_response(status, headers.to_wsgi_list(), exc_info)
+
+        unflushed = 0
+        for chunk in chain(pending, chunks):
+            data = stream.compress(chunk)
+            unflushed += len(chunk)
+            if length is None and unflushed >= self.flush_size:
+                data += stream.flush()
+                unflushed = 0
+            if data:
+                yield data
+        yield stream.finish()
+
+
+def add_vary(headers):
+    vary = headers.get('Vary', '')
+    if 'accept-encoding' not in vary.lower():
+        headers['Vary'] = vary + ', Accept-Encoding' if vary else 'Accept-Encoding'
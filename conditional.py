@@ -0,0 +1,47 @@
+import hashlib
+from functools import wraps
+
+from flask import make_response, request, session
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+# ----------------------------------------------------------------------------#
+# Conditional GET.
+# ----------------------------------------------------------------------------#
+
+# A read view declares a version stamp: a cheap function of its URL
+# arguments returning (last_modified, *anything else the page depends on).
+# The stamp is computed before the view runs; when the client already holds
+# that version the view is skipped and a 304 is returned.
+
+
+def conditional(stamp):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages rendered with pending flash messages are personal
+            if session.get('_flashes'):
+                return view(**kwargs)
+            version = stamp(**kwargs)
+            last_modified = version[0]
+            etag = hashlib.sha1(repr(version).encode('utf-8')).hexdigest()
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            # weak, and varying on Accept-Encoding, both on the 200 and the
+            # 304: CompressionMiddleware weakens the ETag of compressed bodies
+            # and adds the Vary, and a cache only freshens a stored response
+            # with a 304 carrying the same validator
+            response.set_etag(etag, weak=True)
+            response.vary.add('Accept-Encoding')
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # browsers and the CDN may store the page but must revalidate it
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
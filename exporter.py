@@ -0,0 +1,76 @@
+import csv
+import io
+
+from serializers import dumps
+
+# ----------------------------------------------------------------------------#
+# Bulk export.
+# ----------------------------------------------------------------------------#
+
+# Writers behind `flask export` and /api/v1/export. Each consumes an
+# iterator of result rows (fed from a server-side cursor) and produces
+# output incrementally, so memory use does not depend on the table size.
+
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = dumps(dict(zip(columns, row))).decode('utf-8') + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= 64 * 1024:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    yield ''.join(lines)
+
+
+# format name -> (mimetype, chunk generator)
+STREAM_FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'ndjson': ('application/x-ndjson', ndjson_chunks),
+}
+
+
+def write_parquet(path, columns, rows, batch_size=10000):
+    # one row group per batch; needs the optional pyarrow package
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('Parquet export needs the pyarrow package')
+    writer = None
+    try:
+        batch = []
+        for row in rows:
+            batch.append(tuple(row))
+            if len(batch) >= batch_size:
+                writer = _write_batch(pa, pq, writer, path, columns, batch)
+                batch = []
+        if batch or writer is None:
+            writer = _write_batch(pa, pq, writer, path, columns, batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_batch(pa, pq, writer, path, columns, batch):
+    table = pa.Table.from_pydict(dict((name, [row[i] for row in batch]) for i, name in enumerate(columns)))
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+    writer.write_table(table.cast(writer.schema))
+    return writer
@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+import dateutil.parser
+from werkzeug.datastructures import MultiDict
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+# Helpers behind `flask import`: records are streamed from a CSV or NDJSON
+# file, validated with the same WTForms classes as the create views and
+# handed to the caller in chunks, so memory stays flat however large the
+# file is.
+
+
+def detect_format(path):
+    if path.endswith('.ndjson') or path.endswith('.jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+
+# text that CSV (and loosely typed NDJSON) files use for false; the forms'
+# BooleanFields would take any of them as true
+FALSE_VALUES = frozenset(['false', '0', 'no', 'n', 'off', 'f'])
+
+
+def read_records(path, fmt=None, report=None):
+    # yields (line_number, record) pairs; NDJSON lines that are not a JSON
+    # object are passed to report.reject and skipped
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'ndjson':
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    record, error = None, 'not valid JSON: %s' % e
+                else:
+                    error = None if isinstance(record, dict) else 'not a JSON object'
+                if error is None:
+                    yield number, record
+                elif report is not None:
+                    report.reject(number, line.rstrip('\r\n'), {'record': [error]})
+        else:
+            # line 1 is the header
+            for number, record in enumerate(csv.DictReader(f), 2):
+                yield number, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_datetime(value):
+    # a datetime, or its text in any format dateutil reads (ISO 8601 with a
+    # T or a space, as `flask export` writes it); ValueError if missing.
+    # Times with an offset are converted to naive local time, the form
+    # Shows.start_time is stored in
+    if not isinstance(value, datetime):
+        if value is None or not str(value).strip():
+            raise ValueError('This field is required.')
+        try:
+            value = dateutil.parser.parse(str(value))
+        except (ValueError, OverflowError):
+            raise ValueError('Not a valid datetime value.')
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def form_data(record, list_fields=(), boolean_fields=()):
+    # list fields may be given as a JSON list or, in CSV, a comma separated
+    # string
+    data = MultiDict()
+    for key, value in record.items():
+        if value is None or value == '':
+            continue
+        if key in list_fields:
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(',') if v.strip()]
+            for item in value:
+                data.add(key, item)
+        elif isinstance(value, bool):
+            # BooleanField treats any submitted value as true
+            if value:
+                data.add(key, 'y')
+        elif key in boolean_fields:
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data.add(key, 'y')
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def validate(form_class, record, list_fields=(), boolean_fields=()):
+    # returns (form, errors); errors is empty when the record is valid
+    form = form_class(formdata=form_data(record, list_fields, boolean_fields), meta={'csrf': False})
+    form.validate()
+    return form, form.errors
+
+
+def copy_rows(connection, table, columns, rows):
+    # PostgreSQL COPY of `rows` (tuples in `columns` order) through a raw
+    # psycopg2 connection
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+    cursor = connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY %s (%s) FROM STDIN WITH (FORMAT csv, NULL '\\N')" % (table, ', '.join(columns)), buffer)
+    finally:
+        cursor.close()
+
+
+class ImportReport(object):
+
+    def __init__(self, rejects=None):
+        self.loaded = 0
+        self.rejected = 0
+        self.rejects = rejects
+        self.started = time.monotonic()
+
+    def reject(self, number, record, errors):
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({'line': number, 'errors': errors, 'record': record}, default=str) + '\n')
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        rate = self.loaded / self.elapsed if self.elapsed else 0.0
+        return 'Loaded %d row(s), rejected %d, in %.1fs (%.0f rows/s).' % (
+            self.loaded, self.rejected, self.elapsed, rate)
@@ -0,0 +1,235 @@
+import os
+import time
+
+from flask import Response, before_render_template, g, has_request_context, request, signals, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# ----------------------------------------------------------------------------#
+# Metrics.
+# ----------------------------------------------------------------------------#
+
+# With the optional prometheus_client package installed, every request is
+# counted and timed per endpoint, and /metrics serves the results in the
+# Prometheus text format: request counts by status, latency, response size,
+# database time and statement counts, template render time, page cache hits
+# and unhandled exceptions.
+#
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before
+# the workers start; each worker then writes its samples there and /metrics
+# adds up all of them, whichever worker serves it. Add child_exit below to
+# the gunicorn config so the samples of exited workers are cleaned up.
+
+# request and template durations, in seconds
+DURATION_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+# uncompressed response bodies, 256 bytes to 4 MB
+SIZE_BUCKETS = tuple(4 ** i for i in range(4, 12))
+QUERY_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 20, 50, 100)
+
+# requests that matched no route share one label, so stray URLs cannot add
+# label values
+UNMATCHED = '<unmatched>'
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def child_exit(server, worker):
+    # gunicorn server hook: drop the live samples of a worker that exited
+    if prometheus_client is not None and multiprocess_dir():
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class RequestMetrics(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.size = 0
+        self.templates = []
+
+
+class Metrics(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.extensions['metrics'] = self
+        if prometheus_client is None or not app.config['METRICS_ENABLED']:
+            return
+        self.app = app
+        self.registry = prometheus_client.CollectorRegistry()
+        self._create_metrics()
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        # Flask before 2.3 only sends signals with blinker installed
+        if getattr(signals, 'signals_available', True):
+            before_render_template.connect(self._before_render, app)
+            template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._count_exception)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.expose)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def _create_metrics(self):
+        histogram = prometheus_client.Histogram
+        counter = prometheus_client.Counter
+        registry = self.registry
+        self.requests = counter(
+            'fyyur_http_requests_total', 'Requests handled.',
+            ['method', 'endpoint', 'status'], registry=registry)
+        self.latency = histogram(
+            'fyyur_http_request_duration_seconds', 'Time to handle a request, up to the last byte of its body.',
+            ['method', 'endpoint'], buckets=DURATION_BUCKETS, registry=registry)
+        self.response_size = histogram(
+            'fyyur_http_response_size_bytes', 'Response body size, before compression.',
+            ['endpoint'], buckets=SIZE_BUCKETS, registry=registry)
+        self.db_time = histogram(
+            'fyyur_db_duration_seconds', 'Database time per request.',
+            ['endpoint'], buckets=DURATION_BUCKETS, registry=registry)
+        self.db_queries = histogram(
+            'fyyur_db_queries', 'SQL statements per request.',
+            ['endpoint'], buckets=QUERY_BUCKETS, registry=registry)
+        self.template_time = histogram(
+            'fyyur_template_render_duration_seconds', 'Template render time, excluding database time.',
+            ['template'], buckets=DURATION_BUCKETS, registry=registry)
+        self.cache_lookups = counter(
+            'fyyur_page_cache_lookups_total', 'Page cache lookups, by result (hit or miss).',
+            ['endpoint', 'result'], registry=registry)
+        self.exceptions = counter(
+            'fyyur_http_exceptions_total', 'Requests that raised an unhandled exception.',
+            ['endpoint', 'exception'], registry=registry)
+
+    @staticmethod
+    def current():
+        if has_request_context():
+            return g.get('_metrics')
+        return None
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.current() is not None:
+            conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        state = self.current()
+        started = conn.info.get('_metrics_started')
+        if state is None or not started:
+            return
+        state.db_time += time.perf_counter() - started.pop()
+        state.queries += 1
+
+    def _before_render(self, sender, template, context, **extra):
+        state = self.current()
+        if state is not None:
+            state.templates.append((time.perf_counter(), state.db_time))
+
+    def _after_render(self, sender, template, context, **extra):
+        state = self.current()
+        if state is not None and state.templates:
+            started, db_time = state.templates.pop()
+            elapsed = time.perf_counter() - started - (state.db_time - db_time)
+            self.template_time.labels(template.name or '').observe(elapsed)
+
+    def timed_stream(self, template_name, chunks):
+        # the chunks of a streamed template, timing how long each took to
+        # render; database queries run along the way are not counted
+        if not self.enabled:
+            return chunks
+        return self._timed_stream(template_name, iter(chunks))
+
+    def _timed_stream(self, template_name, chunks):
+        # observed once the template is finished, not from a finally clause:
+        # that would run wherever the garbage collector finalizes an
+        # abandoned stream, possibly inside another metric's lock
+        state = self.current()
+        histogram = self.template_time.labels(template_name)
+        elapsed = 0.0
+        while True:
+            started, db_time = time.perf_counter(), state.db_time if state else 0.0
+            chunk = next(chunks, None)
+            elapsed += time.perf_counter() - started - ((state.db_time if state else 0.0) - db_time)
+            if chunk is None:
+                break
+            yield chunk
+        histogram.observe(elapsed)
+
+    def _start(self):
+        g._metrics = RequestMetrics()
+
+    def _finish(self, response):
+        state = self.current()
+        if state is None:
+            return response
+        endpoint = request.endpoint or UNMATCHED
+        method = request.method
+        cache_result = g.get('_page_cache')
+        if cache_result is not None:
+            self.cache_lookups.labels(endpoint, cache_result).inc()
+
+        size = response.content_length
+        if size is None:
+            size = response.calculate_content_length()
+        if size is None:
+            # streamed: count the bytes as they are sent
+            response.response = self._counted(response.response, state, response.charset)
+        else:
+            state.size = size
+
+        # the children are looked up now: labels() takes the metric's lock,
+        # and the close callback below may run while that lock is held
+        requests = self.requests.labels(method, endpoint, response.status_code)
+        latency = self.latency.labels(method, endpoint)
+        response_size = self.response_size.labels(endpoint)
+        db_time = self.db_time.labels(endpoint)
+        db_queries = self.db_queries.labels(endpoint)
+
+        def observe():
+            # once the body has been sent, so streamed pages are timed in full
+            requests.inc()
+            latency.observe(time.perf_counter() - state.started)
+            response_size.observe(state.size)
+            db_time.observe(state.db_time)
+            db_queries.observe(state.queries)
+
+        response.call_on_close(observe)
+        return response
+
+    @staticmethod
+    def _counted(chunks, state, charset):
+        def count():
+            for chunk in chunks:
+                state.size += len(chunk.encode(charset) if isinstance(chunk, str) else chunk)
+                yield chunk
+        # closed along with the response, as the unwrapped body would be
+        return ClosingIterator(count(), getattr(chunks, 'close', None))
+
+    def _count_exception(self, exception):
+        if exception is not None and self.current() is not None:
+            self.exceptions.labels(request.endpoint or UNMATCHED, type(exception).__name__).inc()
+
+    def expose(self):
+        if multiprocess_dir():
+            # the samples of every worker, not just this one
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = self.registry
+        return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,54 @@
+"""show counters
+
+Revision ID: 3d5a9e61c7f2
+Revises: 8c1f4e7a2b90
+Create Date: 2026-10-18 05:02:47.118530
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5a9e61c7f2'
+down_revision = '8c1f4e7a2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.create_table('show_counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # populate the counters from the existing shows; start_time is naive
+    # local time, so the watermark is too
+    now = datetime.now()
+    for table, fk in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.execute(sa.text(
+            'UPDATE {t} SET '
+            'upcoming_shows_count = (SELECT COUNT(*) FROM shows '
+            'WHERE shows.{fk} = {t}.id AND shows.start_time > :now), '
+            'past_shows_count = (SELECT COUNT(*) FROM shows '
+            'WHERE shows.{fk} = {t}.id AND shows.start_time <= :now)'.format(t=table, fk=fk)
+        ).bindparams(now=now))
+    op.execute(sa.text(
+        'INSERT INTO show_counter_state (id, rolled_over_at) VALUES (1, :now)'
+    ).bindparams(now=now))
+
+
+def downgrade():
+    op.drop_table('show_counter_state')
+    for table in ('artist', 'venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,34 @@
+"""updated_at
+
+Revision ID: 6f08a3c2d914
+Revises: e41c0b9d5f27
+Create Date: 2026-10-18 06:37:52.690184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f08a3c2d914'
+down_revision = 'e41c0b9d5f27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows are stamped with the migration time, in UTC like the
+    # ORM's datetime.utcnow (CURRENT_TIMESTAMP is local time on PostgreSQL)
+    if op.get_bind().dialect.name == 'postgresql':
+        now = sa.text("timezone('utc', now())")
+    else:
+        now = sa.func.current_timestamp()
+    for table in ('venue', 'artist', 'shows'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=now))
+
+
+def downgrade():
+    for table in ('shows', 'artist', 'venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,35 @@
+"""name trigram indexes
+
+Revision ID: 8c1f4e7a2b90
+Revises: 5925b02d09e6
+Create Date: 2026-10-18 04:20:11.402317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4e7a2b90'
+down_revision = '5925b02d09e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN trigram indexes let name ILIKE '%term%' and similarity() ranking
+    # avoid a sequential scan; they only exist on PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
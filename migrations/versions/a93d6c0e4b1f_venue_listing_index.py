@@ -0,0 +1,24 @@
+"""venue listing index
+
+Revision ID: a93d6c0e4b1f
+Revises: 6f08a3c2d914
+Create Date: 2026-10-18 09:12:40.318527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93d6c0e4b1f'
+down_revision = '6f08a3c2d914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_state_city_id', 'venue', ['state', 'city', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city_id', table_name='venue')
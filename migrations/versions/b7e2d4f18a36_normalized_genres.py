@@ -0,0 +1,97 @@
+"""normalized genres
+
+Revision ID: b7e2d4f18a36
+Revises: 3d5a9e61c7f2
+Create Date: 2026-10-18 05:41:09.552874
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f18a36'
+down_revision = '3d5a9e61c7f2'
+branch_labels = None
+depends_on = None
+
+
+def parse_genres(value):
+    # genres were stored as the text form of a PostgreSQL array, e.g.
+    # '{Jazz,"Hip-Hop",R&B}'
+    if not value:
+        return []
+    names = value.strip().strip('{}').split(',')
+    return [name.strip().strip('"') for name in names if name.strip().strip('"')]
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id', 'venue_genres', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id', 'artist_genres', ['genre_id', 'artist_id'], unique=False)
+
+    # move the stringified genre lists into the association tables
+    conn = op.get_bind()
+    owners = {}
+    for table in ('venue', 'artist'):
+        owners[table] = [(id, parse_genres(value)) for id, value in
+                         conn.execute(sa.text('SELECT id, genres FROM %s' % table))]
+    names = sorted(set(name for rows in owners.values() for _, genres in rows for name in genres))
+    if names:
+        op.bulk_insert(genre, [{'id': i, 'name': name} for i, name in enumerate(names, 1)])
+        if conn.dialect.name == 'postgresql':
+            op.execute("SELECT setval('genre_id_seq', (SELECT MAX(id) FROM genre))")
+    genre_ids = dict((name, i) for i, name in enumerate(names, 1))
+    for table in ('venue', 'artist'):
+        rows = [{'owner_id': id, 'genre_id': genre_ids[name]}
+                for id, genres in owners[table] for name in set(genres)]
+        if rows:
+            conn.execute(sa.text(
+                'INSERT INTO {t}_genres ({t}_id, genre_id) VALUES (:owner_id, :genre_id)'.format(t=table)
+            ), rows)
+
+    with op.batch_alter_table('venue') as batch_op:
+        batch_op.drop_column('genres')
+    with op.batch_alter_table('artist') as batch_op:
+        batch_op.drop_column('genres')
+
+
+def downgrade():
+    op.add_column('artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('venue', sa.Column('genres', sa.String(), nullable=True))
+
+    conn = op.get_bind()
+    for table in ('venue', 'artist'):
+        genres = {}
+        for id, name in conn.execute(sa.text(
+                'SELECT g.{t}_id, genre.name FROM {t}_genres g '
+                'JOIN genre ON genre.id = g.genre_id ORDER BY genre.name'.format(t=table))):
+            genres.setdefault(id, []).append(name)
+        rows = [{'id': id, 'genres': '{' + ','.join(names) + '}'} for id, names in genres.items()]
+        if rows:
+            conn.execute(sa.text('UPDATE %s SET genres = :genres WHERE id = :id' % table), rows)
+
+    op.drop_index('ix_artist_genres_genre_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('genre')
@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, tuple_
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+# Listings are paged on their sort key rather than with OFFSET, so fetching
+# any page costs one index range scan no matter how deep into the catalogue
+# it is. A cursor is the sort key of the first or last row of a page,
+# serialized into an opaque url-safe token.
+
+
+class Page(object):
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw.decode('utf-8'))
+    except (TypeError, ValueError) as e:
+        raise ValueError('invalid cursor: %s' % e)
+
+
+def decode_cursor(token, columns):
+    # raises ValueError for anything that is not a cursor over `columns`
+    values = _decode(token)
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('invalid cursor')
+    return [datetime.fromisoformat(v) if isinstance(c.type, DateTime) and v is not None else v
+            for c, v in zip(columns, values)]
+
+
+def keyset_page(query, columns, after=None, before=None, limit=50):
+    # `columns` is the unique sort key of `query`; every selected row must
+    # expose each of them as an attribute of the same name
+    def cursor(row):
+        return encode_cursor([getattr(row, c.key) for c in columns])
+
+    key = tuple_(*columns)
+    if before:
+        values = decode_cursor(before, columns)
+        rows = query.filter(key < tuple_(*values)).order_by(
+            *[c.desc() for c in columns]).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return Page(rows,
+                    next_cursor=cursor(rows[-1]) if rows else None,
+                    prev_cursor=cursor(rows[0]) if rows and has_more else None)
+
+    if after:
+        query = query.filter(key > tuple_(*decode_cursor(after, columns)))
+    rows = query.order_by(*columns).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return Page(rows,
+                next_cursor=cursor(rows[-1]) if has_more else None,
+                prev_cursor=cursor(rows[0]) if rows and after else None)
+
+
+# Relevance-ranked search results have no unique sort key to page on, and
+# ranking them means finding every match anyway, so they are paged by
+# position instead, with the offset in the same kind of opaque token.
+
+
+def encode_offset(offset):
+    return encode_cursor(['offset', offset])
+
+
+def decode_offset(token):
+    values = _decode(token)
+    if (not isinstance(values, list) or len(values) != 2 or values[0] != 'offset' or
+            not isinstance(values[1], int) or values[1] < 0):
+        raise ValueError('invalid cursor')
+    return values[1]
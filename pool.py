@@ -0,0 +1,70 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+# ----------------------------------------------------------------------------#
+# Connection pool metrics.
+# ----------------------------------------------------------------------------#
+
+# Counters are per process: with gunicorn each worker has its own pool, so
+# the database sees up to workers * (pool_size + max_overflow) connections.
+
+
+class MeteredQueuePool(QueuePool):
+    # QueuePool that records checkout wait times, overflow connections and
+    # checkout timeouts
+
+    def __init__(self, *args, **kwargs):
+        super(MeteredQueuePool, self).__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.checked_out_peak = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        overflow = self._overflow
+        try:
+            connection = super(MeteredQueuePool, self).connect()
+        except PoolTimeout:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._metrics_lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            # _overflow counts up from -pool_size as connections are opened
+            if self._overflow > overflow and self._overflow > 0:
+                self.overflow_events += 1
+            self.checked_out_peak = max(self.checked_out_peak, self.checkedout())
+        return connection
+
+
+def pool_stats(pool):
+    stats = {'class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        stats.update({
+            'checkouts': pool.checkouts,
+            'checked_out_peak': pool.checked_out_peak,
+            'wait_seconds_total': round(pool.wait_total, 6),
+            'wait_seconds_max': round(pool.wait_max, 6),
+            'wait_seconds_avg': round(pool.wait_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+            'overflow_events': pool.overflow_events,
+            'timeouts': pool.timeouts,
+        })
+    return stats
@@ -0,0 +1,137 @@
+import heapq
+import json
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------------------------------------------------------------------#
+# SQL profiler.
+# ----------------------------------------------------------------------------#
+
+# Opt-in (SQL_PROFILER_ENABLED). Counts the statements each request issues
+# and their total time, keeps the slowest few, and reports them in a
+# Server-Timing header and one JSON log line per request. Requests over
+# SQL_PROFILER_SLOW_MS of database time or SQL_PROFILER_MAX_QUERIES
+# statements are logged as warnings, with EXPLAIN output for their slowest
+# statements when SQL_PROFILER_EXPLAIN is set.
+
+
+class RequestProfile(object):
+
+    def __init__(self, top):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.top = top
+        # min-heap of (duration, order, engine, statement, parameters)
+        self.slowest = []
+
+    def record(self, engine, statement, parameters, duration, executemany):
+        self.queries += 1
+        self.db_time += duration
+        entry = (duration, self.queries, engine, statement, None if executemany else parameters)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_first(self):
+        return sorted(self.slowest, key=lambda entry: entry[0], reverse=True)
+
+
+class SQLProfiler(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_PROFILER_ENABLED', False)
+        app.config.setdefault('SQL_PROFILER_SLOW_MS', 100)
+        app.config.setdefault('SQL_PROFILER_MAX_QUERIES', 20)
+        app.config.setdefault('SQL_PROFILER_TOP', 3)
+        app.config.setdefault('SQL_PROFILER_EXPLAIN', False)
+        app.extensions['sql_profiler'] = self
+        if not app.config['SQL_PROFILER_ENABLED']:
+            return
+        self.app = app
+        # listening on the Engine class covers every bind
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start)
+        app.after_request(self._add_header)
+        app.teardown_request(self._finish)
+
+    @staticmethod
+    def current():
+        # the profile of the current request, if it is being profiled
+        if has_request_context():
+            return g.get('_sql_profile')
+        return None
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.current() is not None:
+            conn.info.setdefault('_profiler_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self.current()
+        started = conn.info.get('_profiler_started')
+        if profile is None or not started:
+            return
+        profile.record(conn.engine, statement, parameters, time.perf_counter() - started.pop(), executemany)
+
+    def _start(self):
+        g._sql_profile = RequestProfile(self.app.config['SQL_PROFILER_TOP'])
+
+    def _add_header(self, response):
+        # statements run while a streamed body is generated come after the
+        # headers, so only the log line has the complete numbers
+        profile = self.current()
+        if profile is not None:
+            response.headers.add('Server-Timing', 'db;desc="%d queries";dur=%.1f, app;dur=%.1f' % (
+                profile.queries, profile.db_time * 1000, (time.perf_counter() - profile.started) * 1000))
+        return response
+
+    def _finish(self, exception):
+        # popped first, so the EXPLAIN statements below are not profiled
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return
+        config = self.app.config
+        db_ms = profile.db_time * 1000
+        slow = db_ms >= config['SQL_PROFILER_SLOW_MS'] or profile.queries > config['SQL_PROFILER_MAX_QUERIES']
+        slowest = [{'ms': round(duration * 1000, 2), 'sql': statement}
+                   for duration, _, _, statement, _ in profile.slowest_first()]
+        if slow and config['SQL_PROFILER_EXPLAIN']:
+            for entry, (_, _, engine, statement, parameters) in zip(slowest, profile.slowest_first()):
+                entry['plan'] = self.explain(engine, statement, parameters)
+        record = {
+            'event': 'sql_profile',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'queries': profile.queries,
+            'db_ms': round(db_ms, 2),
+            'request_ms': round((time.perf_counter() - profile.started) * 1000, 2),
+            'slow': slow,
+            'slowest': slowest,
+        }
+        if exception is not None:
+            record['error'] = type(exception).__name__
+        log = self.app.logger.warning if slow else self.app.logger.info
+        log(json.dumps(record, default=str))
+
+    def explain(self, engine, statement, parameters):
+        # the plan as a list of lines, without running the statement
+        if parameters is None or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+        except Exception as e:
+            return ['EXPLAIN failed: %s' % e]
+        return [' '.join(str(value) for value in row) for row in rows]
@@ -0,0 +1,148 @@
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import orm
+from sqlalchemy.sql.expression import CompoundSelect, Select
+
+# ----------------------------------------------------------------------------#
+# Read replicas.
+# ----------------------------------------------------------------------------#
+
+# SQLALCHEMY_BINDS entries named replica* are read replicas. SELECTs issued
+# while handling GET requests (and views marked with @replica_reads, such as
+# the search forms) go to a replica; writes, flushes, other requests and CLI
+# commands use the primary. After a write request the client is pinned to
+# the primary for REPLICA_STICKY_SECONDS so it reads its own writes, and a
+# replica lagging more than REPLICA_MAX_LAG_SECONDS is skipped.
+
+STICKY_COOKIE = 'read_primary'
+
+PG_LAG = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_reads(view):
+    # let a view that is not a GET read from the replicas
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g._replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.app.extensions.get('replica_router')
+        if (router is not None and not self._flushing and
+                isinstance(clause, (Select, CompoundSelect)) and router.reads_allowed()):
+            engine = router.choose()
+            if engine is not None:
+                return engine
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter(object):
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = None
+        self._lags = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 10)
+        app.config.setdefault('REPLICA_LAG_CHECK_SECONDS', 5)
+        app.extensions['replica_router'] = self
+        app.after_request(self._pin_writers)
+        self.app = app
+        self.db = db
+
+    @property
+    def replicas(self):
+        binds = self.app.config.get('SQLALCHEMY_BINDS') or {}
+        return sorted(key for key in binds if key.startswith('replica'))
+
+    def reads_allowed(self):
+        if not has_request_context():
+            return False
+        if request.method not in ('GET', 'HEAD') and not g.get('_replica_reads'):
+            return False
+        return not self.pinned()
+
+    def pinned(self):
+        # the client wrote within REPLICA_STICKY_SECONDS and must see its writes
+        return has_request_context() and STICKY_COOKIE in request.cookies
+
+    def use_primary(self):
+        # send the rest of this request's reads to the primary, e.g. for data
+        # that outlives the request in a cache
+        g._replica_engine = None
+
+    def choose(self):
+        # the replica for this request, or None for the primary. It is chosen
+        # once per request, so a page, its version stamp and its ETag are all
+        # read from the same replica at the same point in its replay
+        if '_replica_engine' not in g:
+            g._replica_engine = self._next_replica()
+        return g._replica_engine
+
+    def _next_replica(self):
+        # the next replica within the lag limit, or None for the primary
+        replicas = self.replicas
+        if not replicas:
+            return None
+        start = next(self._turn)
+        for i in range(len(replicas)):
+            key = replicas[(start + i) % len(replicas)]
+            engine = self.db.get_engine(self.app, bind=key)
+            if self.lag(key, engine) <= self.app.config['REPLICA_MAX_LAG_SECONDS']:
+                return engine
+        return None
+
+    def lag(self, key, engine):
+        # replication lag in seconds, measured at most every
+        # REPLICA_LAG_CHECK_SECONDS; infinite while the replica is unreachable
+        now = time.monotonic()
+        with self._lock:
+            checked = self._lags.get(key)
+            if checked is not None and now - checked[1] < self.app.config['REPLICA_LAG_CHECK_SECONDS']:
+                return checked[0]
+            # other requests keep using the previous value while this one checks
+            self._lags[key] = (checked[0] if checked else 0.0, now)
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == 'postgresql':
+                    lag = float(conn.exec_driver_sql(PG_LAG).scalar() or 0)
+                else:
+                    conn.exec_driver_sql('SELECT 1')
+                    lag = 0.0
+        except Exception:
+            self.app.logger.exception('replica %s is unavailable', key)
+            lag = float('inf')
+        with self._lock:
+            self._lags[key] = (lag, now)
+        return lag
+
+    def _pin_writers(self, response):
+        # a plain cookie rather than the session, so it holds across workers
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and not g.get('_replica_reads') and self.replicas:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=self.app.config['REPLICA_STICKY_SECONDS'], httponly=True)
+        return response
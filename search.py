@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+# ----------------------------------------------------------------------------#
+# Name search.
+# ----------------------------------------------------------------------------#
+
+# On PostgreSQL name search is served by pg_trgm GIN indexes (see the
+# `name trigram indexes` migration). Other databases, i.e. the SQLite files
+# used for local test runs, fall back to the in-process index below, which
+# mirrors the same substring-match and similarity-ranking semantics.
+
+
+def escape_like(term, escape='\\'):
+    # escape LIKE wildcards so a search term only ever matches literally
+    return term.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+
+def trigrams(text):
+    # pg_trgm style trigrams: each word is lower-cased and padded with two
+    # leading blanks and one trailing blank
+    grams = set()
+    for word in text.lower().split():
+        word = '  ' + word + ' '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def similarity(a, b):
+    # same measure as pg_trgm's similarity(): shared trigrams over all trigrams
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+def _substring_grams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class TrigramIndex(object):
+    # Maps every raw trigram of a lower-cased name to the ids containing it.
+    # A term of three or more characters only has to be checked against the
+    # ids that contain all of its trigrams; shorter terms scan every name.
+
+    def __init__(self, rows=()):
+        self._names = {}
+        self._postings = defaultdict(set)
+        for id, name in rows:
+            self.add(id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, id, name):
+        self.remove(id)
+        name = (name or '').lower()
+        self._names[id] = name
+        for gram in _substring_grams(name):
+            self._postings[gram].add(id)
+
+    def remove(self, id):
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        for gram in _substring_grams(name):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(id)
+                if not posting:
+                    del self._postings[gram]
+
+    def search(self, term):
+        # ids whose name contains `term` (case-insensitively), most similar
+        # first, ties broken by name
+        term = term.lower()
+        grams = _substring_grams(term)
+        if grams:
+            postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self._names.keys()
+        matches = [id for id in candidates if term in self._names[id]]
+        matches.sort(key=lambda id: (-similarity(term, self._names[id]), self._names[id], id))
+        return matches